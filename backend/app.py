@@ -1,28 +1,97 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, abort, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-from datetime import datetime, timedelta
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timedelta, timezone
+import base64
+import functools
+import csv
+import hashlib
+import hmac
+import io
+import json
 import os
+import queue
+from types import SimpleNamespace
 from dotenv import load_dotenv
+from events import broker, format_sse
+from hashing import PasswordHasher, HasherBusy
+from cache import telegram_users
+from webhook import telegram_updates
+from tokens import TokenRevocations
+from archiver import TaskArchiver
+from ratelimit import RateLimiter, RateLimited, SharedBuckets, parse_limit
+from metrics import Gauge, instrument_app, registry
+from fastjson import FastJSONProvider
+from dbconfig import configure_sqlite
+from search import SEARCH_CANDIDATES, SEARCH_SQL, mark_matches, search_params
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'tuned')
+app.config['DEPLOYMENT_MODE'] = os.environ.get('DEPLOYMENT_MODE', 'single')
+app.config['REMINDER_LEAD_MINUTES'] = int(os.environ.get('REMINDER_LEAD_MINUTES', 60))
+app.config['REMINDER_RATE_PER_SECOND'] = float(os.environ.get('REMINDER_RATE_PER_SECOND', 20))
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+app.config['TOKEN_REVOCATION_REFRESH_SECONDS'] = float(os.environ.get('TOKEN_REVOCATION_REFRESH_SECONDS', 5))
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 0))
+app.config['BOT_MODE'] = os.environ.get('BOT_MODE', 'polling')
+app.config['TELEGRAM_WEBHOOK_URL'] = os.environ.get('TELEGRAM_WEBHOOK_URL')
+app.config['TELEGRAM_WEBHOOK_SECRET'] = os.environ.get('TELEGRAM_WEBHOOK_SECRET')
+app.config['BOT_WEBHOOK_WORKERS'] = int(os.environ.get('BOT_WEBHOOK_WORKERS', 8))
+app.config['BOT_WEBHOOK_MAX_PENDING'] = int(os.environ.get('BOT_WEBHOOK_MAX_PENDING', 1000))
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 200))
+app.config['ARCHIVE_INTERVAL_MINUTES'] = float(os.environ.get('ARCHIVE_INTERVAL_MINUTES', 60))
+app.config['RATE_LIMIT_AUTH'] = os.environ.get('RATE_LIMIT_AUTH', '20/60')
+app.config['RATE_LIMIT_AUTH_IP'] = os.environ.get('RATE_LIMIT_AUTH_IP', '300/60')
+app.config['RATE_LIMIT_READ'] = os.environ.get('RATE_LIMIT_READ', '600/60')
+app.config['RATE_LIMIT_WRITE'] = os.environ.get('RATE_LIMIT_WRITE', '120/60')
+app.config['RATE_LIMIT_BOT'] = os.environ.get('RATE_LIMIT_BOT', '30/60')
+app.config['RATE_LIMIT_STORAGE'] = os.environ.get('RATE_LIMIT_STORAGE')
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['BCRYPT_WORKERS'] = int(os.environ.get('BCRYPT_WORKERS', 2))
+app.config['BCRYPT_MAX_PENDING'] = int(os.environ.get('BCRYPT_MAX_PENDING', 16))
+
+configure_sqlite(app, app.config['SQLITE_PROFILE'], app.config['DEPLOYMENT_MODE'], overrides={
+    'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT_MS'),
+    'mmap_size': os.environ.get('SQLITE_MMAP_SIZE'),
+    'cache_size': os.environ.get('SQLITE_CACHE_SIZE'),
+})
+
+if app.config['PROXY_FIX_X_FOR']:
+    # Behind that many trusted proxies the client address comes from X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 cors = CORS(app)  
 bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
+password_hasher = PasswordHasher(
+    rounds=app.config['BCRYPT_LOG_ROUNDS'],
+    workers=app.config['BCRYPT_WORKERS'],
+    max_pending=app.config['BCRYPT_MAX_PENDING'],
+)
+# Token buckets per client IP and email (auth), client IP (auth_ip), user (read/write API calls) and Telegram user (bot).
+# RATE_LIMIT_STORAGE names a SQLite file, ideally on tmpfs, shared by gunicorn workers
+rate_limiter = RateLimiter(
+    {name: parse_limit(app.config[f'RATE_LIMIT_{name.upper()}'])
+     for name in ('auth', 'auth_ip', 'read', 'write', 'bot')},
+    backend=SharedBuckets(app.config['RATE_LIMIT_STORAGE']) if app.config['RATE_LIMIT_STORAGE'] else None,
+)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -32,15 +101,25 @@ class User(db.Model):
     telegram_id = db.Column(db.BigInteger, unique=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
+    tasks_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Change log entries up to this seq may have been compacted away
+    changes_floor = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     tasks = db.relationship('Task', backref='user', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        from flask_bcrypt import generate_password_hash
-        self.password_hash = generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        from flask_bcrypt import check_password_hash
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
+
+    @staticmethod
+    def bump_tasks_version(user_id):
+        # Runs in the caller's transaction so the version moves with the task change
+        User.query.filter_by(id=user_id).update(
+            {User.tasks_version: User.tasks_version + 1}, synchronize_session=False)
 
     @staticmethod
     def validate_email(email):
@@ -70,6 +149,250 @@ class User(db.Model):
             user_dict['password_hash'] = self.password_hash
         return user_dict
 
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def invalidate_telegram_user(mapper, connection, user):
+    # Covers deactivation, relinking and account deletion done through the ORM
+    history = db.inspect(user).attrs.telegram_id.history
+    for telegram_id in (user.telegram_id, *history.deleted):
+        if telegram_id is not None:
+            telegram_users.invalidate(telegram_id)
+
+class TokenRevocation(db.Model):
+    # Users whose earlier access tokens are no longer valid: tokens with an older
+    # "gen" claim, or every token while the account is inactive or deleted. No
+    # foreign key, the row has to outlive a deleted user.
+    __tablename__ = 'token_revocation'
+    user_id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, default=0, nullable=False)
+    active = db.Column(db.Boolean, default=True, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    @staticmethod
+    def revoke(connection, user_id, active=True):
+        table = TokenRevocation.__table__
+        upsert = sqlite_insert(table).values(
+            user_id=user_id, generation=1, active=active, updated_at=datetime.utcnow())
+        connection.execute(upsert.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'generation': table.c.generation + 1, 'active': upsert.excluded.active,
+                  'updated_at': upsert.excluded.updated_at}))
+
+    @staticmethod
+    def generation_for(user_id):
+        return db.session.query(TokenRevocation.generation).filter_by(user_id=user_id).scalar() or 0
+
+def flag_token_revocation(user):
+    db.inspect(user).session.info['tokens_revoked'] = True
+
+@db.event.listens_for(User, 'after_insert')
+def reinstate_user_tokens(mapper, connection, user):
+    # SQLite may hand a deleted user's id to a new account; lift the old revocation
+    table = TokenRevocation.__table__
+    result = connection.execute(table.update().where(table.c.user_id == user.id).values(
+        generation=table.c.generation + 1, active=True, updated_at=datetime.utcnow()))
+    if result.rowcount:
+        flag_token_revocation(user)
+
+@db.event.listens_for(User, 'after_update')
+def revoke_deactivated_user_tokens(mapper, connection, user):
+    if db.inspect(user).attrs.is_active.history.has_changes():
+        TokenRevocation.revoke(connection, user.id, active=bool(user.is_active))
+        flag_token_revocation(user)
+
+@db.event.listens_for(User, 'after_delete')
+def revoke_deleted_user_tokens(mapper, connection, user):
+    TokenRevocation.revoke(connection, user.id, active=False)
+    flag_token_revocation(user)
+
+@db.event.listens_for(db.session, 'after_commit')
+def refresh_token_revocations(session):
+    if session.info.pop('tokens_revoked', False):
+        token_revocations.mark_stale()
+
+def load_token_revocations(since):
+    query = db.select(TokenRevocation.user_id, TokenRevocation.generation,
+                      TokenRevocation.active, TokenRevocation.updated_at)
+    if since is not None:
+        query = query.filter(TokenRevocation.updated_at > since)
+    return db.session.execute(query).all()
+
+token_revocations = TokenRevocations(
+    load_token_revocations, interval=app.config['TOKEN_REVOCATION_REFRESH_SECONDS'])
+
+def issue_token(user):
+    return create_access_token(identity=str(user.id), additional_claims={
+        'gen': TokenRevocation.generation_for(user.id),
+        'active': user.is_active,
+    })
+
+task_tags = db.Table(
+    'task_tags',
+    db.Column('task_id', db.Integer, db.ForeignKey('task.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_task_tags_tag_task', 'tag_id', 'task_id'),
+)
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+    task_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_tag_user_name'),
+    )
+
+    def to_dict(self):
+        return {'name': self.name, 'count': self.task_count}
+
+class TaskReminder(db.Model):
+    # One row per deadline reminder already sent, so restarts don't resend it.
+    # Keyed by due_date too: moving a deadline earns a new reminder.
+    __tablename__ = 'task_reminder'
+    task_id = db.Column(db.Integer, primary_key=True)
+    due_date = db.Column(db.DateTime, primary_key=True)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class TaskCounter(db.Model):
+    # Materialized per-user counts behind /api/tasks/summary. Keys are "total",
+    # "status:<s>", "priority:<p>", "completed:<true|false>" and, for open tasks
+    # with a deadline, "due:<YYYY-MM-DD>" from today on or "overdue" for earlier
+    # days. Rows for days that have since passed are folded into "overdue" by
+    # roll_overdue, so a user has at most one row per upcoming deadline day.
+    __tablename__ = 'task_counter'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    key = db.Column(db.String(40), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    @staticmethod
+    def keys_for(task, today):
+        completed = bool(task.completed)
+        keys = ['total', f'status:{task.status}', f'priority:{task.priority}',
+                f'completed:{str(completed).lower()}']
+        if task.due_date and not completed:
+            due = task.due_date.date()
+            keys.append('overdue' if due < today else f'due:{due.isoformat()}')
+        return keys
+
+    @staticmethod
+    def _upsert(rows):
+        upsert = sqlite_insert(TaskCounter.__table__)
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['user_id', 'key'],
+            set_={'count': TaskCounter.__table__.c.count + upsert.excluded.count}), rows)
+
+    @staticmethod
+    def roll_overdue(user_id, today):
+        """Fold the user's "due:<date>" rows for days before ``today`` into
+        "overdue". Reads only the key range of days that passed since the last
+        roll. Returns True if anything moved."""
+        past = db.and_(TaskCounter.user_id == user_id,
+                       TaskCounter.key >= 'due:', TaskCounter.key < f'due:{today.isoformat()}')
+        moved = db.session.execute(db.select(db.func.sum(TaskCounter.count)).filter(past)).scalar()
+        if not moved:
+            return False
+        TaskCounter._upsert([{'user_id': user_id, 'key': 'overdue', 'count': moved}])
+        db.session.execute(db.delete(TaskCounter).filter(past))
+        return True
+
+    @staticmethod
+    def apply(user_id, before=(), after=()):
+        """Move counters from the ``before`` task states to the ``after`` ones.
+
+        States are anything with status, priority, completed and due_date
+        attributes (ORM instances or selected rows). Runs in the caller's
+        transaction so counts commit or roll back with the task change.
+        """
+        # Roll first so a past deadline is counted under "overdue" whichever
+        # day its counter was written on
+        today = datetime.utcnow().date()
+        TaskCounter.roll_overdue(user_id, today)
+        deltas = {}
+        for task in before:
+            for key in TaskCounter.keys_for(task, today):
+                deltas[key] = deltas.get(key, 0) - 1
+        for task in after:
+            for key in TaskCounter.keys_for(task, today):
+                deltas[key] = deltas.get(key, 0) + 1
+        rows = [{'user_id': user_id, 'key': key, 'count': delta} for key, delta in deltas.items() if delta]
+        if not rows:
+            return
+        TaskCounter._upsert(rows)
+        db.session.execute(db.delete(TaskCounter).filter(
+            TaskCounter.user_id == user_id, TaskCounter.count <= 0))
+
+    @staticmethod
+    def rebuild():
+        db.session.execute(db.delete(TaskCounter))
+        today = datetime.utcnow().date().isoformat()
+        due_day = db.func.date(Task.due_date)
+        groups = [
+            (db.literal('total'), None),
+            (db.literal('status:') + Task.status, None),
+            (db.literal('priority:') + Task.priority, None),
+            (db.case((Task.completed, 'completed:true'), else_='completed:false'), None),
+            (db.case((due_day < today, 'overdue'), else_=db.literal('due:') + due_day),
+             db.and_(Task.due_date.isnot(None), Task.completed.is_(False))),
+        ]
+        for key, condition in groups:
+            query = db.select(Task.user_id, key.label('key'), db.func.count().label('count')) \
+                .filter(Task.user_id.isnot(None)).group_by(Task.user_id, key)
+            if condition is not None:
+                query = query.filter(condition)
+            db.session.execute(db.insert(TaskCounter).from_select(['user_id', 'key', 'count'], query))
+
+class TaskChange(db.Model):
+    # Append-only log of task upserts and deletes behind /api/tasks/changes.
+    # AUTOINCREMENT so compaction never lets a sequence number be reused.
+    __tablename__ = 'task_change'
+    seq = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    task_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # upsert, delete
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_task_change_user_seq', 'user_id', 'seq'),
+        db.Index('ix_task_change_task_seq', 'task_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    @staticmethod
+    def compact(client_ttl=timedelta(days=30)):
+        """Shrink the log without changing what any client can sync.
+
+        Entries superseded by a newer one for the same task are always safe to
+        drop. Tombstones are dropped up to the lowest seq every recently seen
+        client has synced past; the user's changes_floor then moves there so
+        a client still behind it is told to resync from 0.
+        """
+        db.session.execute(db.delete(SyncClient).filter(SyncClient.seen_at < datetime.utcnow() - client_ttl))
+        latest = db.select(db.func.max(TaskChange.seq)).group_by(TaskChange.task_id)
+        superseded = db.session.execute(db.delete(TaskChange).filter(TaskChange.seq.not_in(latest))).rowcount
+
+        acked = dict(db.session.execute(
+            db.select(SyncClient.user_id, db.func.min(SyncClient.last_seq)).group_by(SyncClient.user_id)).all())
+        tombstones = 0
+        for user_id, max_seq in db.session.execute(
+                db.select(TaskChange.user_id, db.func.max(TaskChange.seq))
+                .filter(TaskChange.op == 'delete').group_by(TaskChange.user_id)).all():
+            # Nobody syncing means nobody needs the tombstones
+            floor = min(acked.get(user_id, max_seq), max_seq)
+            tombstones += db.session.execute(db.delete(TaskChange).filter(
+                TaskChange.user_id == user_id, TaskChange.op == 'delete', TaskChange.seq <= floor)).rowcount
+            User.query.filter(User.id == user_id, User.changes_floor < floor).update(
+                {User.changes_floor: floor}, synchronize_session=False)
+        return superseded, tombstones
+
+class SyncClient(db.Model):
+    # Last seq each syncing client confirmed (by asking for changes since it)
+    __tablename__ = 'sync_client'
+    user_id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(64), primary_key=True)
+    last_seq = db.Column(db.Integer, default=0, nullable=False)
+    seen_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -82,6 +405,108 @@ class Task(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     status= db.Column(db.String(100), nullable=False)
     tags= db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_task_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_task_user_completed_created', 'user_id', 'completed', 'created_at'),
+        db.Index('ix_task_user_priority_created', 'user_id', 'priority', 'created_at'),
+        db.Index('ix_task_user_due_date', 'user_id', 'due_date'),
+        db.Index('ix_task_due_date', 'due_date'),
+        # Finds archival candidates without scanning open tasks
+        db.Index('ix_task_completed_updated', 'updated_at', sqlite_where=db.text('completed = 1')),
+        # Ids of archived tasks must never be handed out again
+        {'sqlite_autoincrement': True},
+    )
+
+    @staticmethod
+    def parse_tags(value):
+        # Clients send a JSON array string (the web app), a list, or comma separated text
+        if not value:
+            return []
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = value.split(',')
+        if not isinstance(value, list):
+            value = [value]
+        names = []
+        for item in value:
+            name = str(item).strip()[:50]
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    @staticmethod
+    def insert_many(rows):
+        """Insert ``rows`` with one executemany and return the new tasks in
+        row order, in the caller's transaction.
+
+        RETURNING with sort_by_parameter_order would make SQLite insert row by
+        row. Task ids only grow and no other connection can write until this
+        transaction ends, so the new rows are the ones with the highest ids.
+        """
+        db.session.execute(Task.__table__.insert(), rows)
+        last_id = db.session.query(db.func.max(Task.id)).scalar()
+        return db.session.scalars(
+            db.select(Task).filter(Task.id > last_id - len(rows)).order_by(Task.id)).all()
+
+    @staticmethod
+    def log_changes(user_id, task_ids, op):
+        # Runs in the caller's transaction, like sync_tags and TaskCounter.apply
+        now = datetime.utcnow()
+        rows = [{'user_id': user_id, 'task_id': task_id, 'op': op, 'changed_at': now} for task_id in task_ids]
+        if rows:
+            db.session.execute(db.insert(TaskChange), rows)
+
+    @staticmethod
+    def sync_tags(user_id, changes):
+        """Apply tag changes for one user's tasks in the caller's transaction.
+
+        ``changes`` is a list of ``(task_id, old_tags, new_tags)`` where the tag
+        values are anything ``parse_tags`` accepts. Updates the task_tags links
+        and each tag's task_count, and removes tags no longer used.
+        """
+        added, removed = [], []
+        for task_id, old, new in changes:
+            old, new = set(Task.parse_tags(old)), set(Task.parse_tags(new))
+            added.extend((task_id, name) for name in new - old)
+            removed.extend((task_id, name) for name in old - new)
+        if not added and not removed:
+            return
+
+        names = {name for _, name in added} | {name for _, name in removed}
+        tag_ids = dict(db.session.execute(
+            db.select(Tag.name, Tag.id).filter(Tag.user_id == user_id, Tag.name.in_(names))).all())
+        missing = [{'user_id': user_id, 'name': name, 'task_count': 0}
+                   for name in {name for _, name in added} if name not in tag_ids]
+        if missing:
+            tag_ids.update(db.session.execute(
+                db.insert(Tag).returning(Tag.name, Tag.id), missing).all())
+
+        deltas = {}
+        if added:
+            db.session.execute(task_tags.insert(),
+                               [{'task_id': task_id, 'tag_id': tag_ids[name]} for task_id, name in added])
+            for _, name in added:
+                deltas[tag_ids[name]] = deltas.get(tag_ids[name], 0) + 1
+        removed = [(task_id, tag_ids[name]) for task_id, name in removed if name in tag_ids]
+        if removed:
+            db.session.execute(
+                task_tags.delete().where(task_tags.c.task_id == db.bindparam('t_id'),
+                                         task_tags.c.tag_id == db.bindparam('g_id')),
+                [{'t_id': task_id, 'g_id': tag_id} for task_id, tag_id in removed])
+            for _, tag_id in removed:
+                deltas[tag_id] = deltas.get(tag_id, 0) - 1
+
+        deltas = [{'g_id': tag_id, 'delta': delta} for tag_id, delta in deltas.items() if delta]
+        if deltas:
+            tag_table = Tag.__table__
+            db.session.execute(
+                tag_table.update().where(tag_table.c.id == db.bindparam('g_id'))
+                .values(task_count=tag_table.c.task_count + db.bindparam('delta')), deltas)
+        db.session.execute(db.delete(Tag).filter(Tag.user_id == user_id, Tag.task_count <= 0))
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -97,6 +522,130 @@ class Task(db.Model):
             'tags': self.tags
         }
 
+class ArchivedTask(db.Model):
+    # Completed tasks moved out of the task table once untouched for
+    # ARCHIVE_AFTER_DAYS. Same ids and columns; archived tasks can be read and
+    # deleted but not changed, have no task_tags links or search entries and
+    # are not in task_counter.
+    __tablename__ = 'task_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    completed = db.Column(db.Boolean, default=True, nullable=False)
+    priority = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    due_date = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(100), nullable=False)
+    tags = db.Column(db.Text)  # always a JSON array, so json_each can filter on it
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_task_archive_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+    @staticmethod
+    def archive(cutoff, limit):
+        """Move up to ``limit`` tasks completed and last updated before
+        ``cutoff`` into the archive, in the caller's transaction.
+
+        Tag links, counters and pending reminders go as if the task were
+        deleted, but nothing is written to the change log: the task still
+        exists, and /api/tasks/changes reads it from the archive.
+        """
+        tasks = Task.__table__
+        rows = db.session.execute(
+            # "= 1", not "IS 1": only the former matches ix_task_completed_updated's WHERE
+            db.select(tasks).where(tasks.c.completed == db.true(), tasks.c.updated_at < cutoff)
+            .order_by(tasks.c.updated_at).limit(limit)).all()
+        if not rows:
+            return 0
+
+        now = datetime.utcnow()
+        db.session.execute(db.insert(ArchivedTask), [
+            dict(row._mapping, tags=json.dumps(Task.parse_tags(row.tags)), archived_at=now) for row in rows])
+        task_ids = [row.id for row in rows]
+        # The rows were read before this transaction took the write lock; any
+        # edit since then moved updated_at, so a short count means start over
+        moved = Task.query.filter(Task.id.in_(task_ids), Task.completed == db.true(),
+                                  Task.updated_at < cutoff).delete(synchronize_session=False)
+        if moved != len(rows):
+            raise RuntimeError('Tasks changed while being archived')
+        by_user = {}
+        for row in rows:
+            if row.user_id is not None:
+                by_user.setdefault(row.user_id, []).append(row)
+        for user_id, user_rows in by_user.items():
+            Task.sync_tags(user_id, [(row.id, row.tags, None) for row in user_rows])
+            TaskCounter.apply(user_id, before=user_rows)
+            User.bump_tasks_version(user_id)
+        TaskReminder.query.filter(TaskReminder.task_id.in_(task_ids)).delete(synchronize_session=False)
+        return len(rows)
+
+instrument_app(app, slow_request_ms=app.config['SLOW_REQUEST_MS'])
+registry.register(Gauge('sse_subscribers', 'Open /api/tasks/stream connections', broker.subscriber_count))
+registry.register(Gauge('telegram_user_cache', 'Telegram id -> user cache statistics',
+                        lambda: {(k,): v for k, v in telegram_users.stats().items()}, ('stat',)))
+registry.register(Gauge('token_revocation_refreshes', 'Reloads of the token revocation list',
+                        lambda: token_revocations.refreshes))
+registry.register(Gauge('rate_limited_requests', 'Requests and bot updates rejected per rate limit',
+                        lambda: {(k,): v for k, v in rate_limiter.limited.items()}, ('limit',)))
+# Started from __main__; gunicorn deployments run init_db.py --archive from cron instead
+task_archiver = TaskArchiver(
+    app, db, ArchivedTask.archive,
+    age=timedelta(days=app.config['ARCHIVE_AFTER_DAYS']),
+    batch_size=app.config['ARCHIVE_BATCH_SIZE'],
+    interval=app.config['ARCHIVE_INTERVAL_MINUTES'] * 60,
+)
+registry.register(Gauge('tasks_archived', 'Completed tasks moved to the archive since start',
+                        lambda: task_archiver.archived))
+registry.register(Gauge('telegram_webhook_updates', 'Telegram webhook update queue statistics',
+                        lambda: {(k,): v for k, v in telegram_updates.stats().items()}, ('stat',)))
+
+@app.before_request
+def limit_auth_requests():
+    # Per client IP and, for login and register, the email, plus a larger
+    # budget per IP alone: the frontend's server sends every user's login from
+    # its one address, so the first keeps one user from locking out the rest
+    # while the second still caps how many accounts one address can try.
+    # Authenticated routes are limited per user in token_revoked
+    if request.path.startswith('/api/auth/') and request.method != 'OPTIONS':
+        rate_limiter.hit('auth_ip', request.remote_addr)
+        data = request.get_json(silent=True)
+        email = data.get('email') if isinstance(data, dict) else None
+        key = request.remote_addr
+        if isinstance(email, str):
+            key = f'{key} {email.strip().lower()}'
+        rate_limiter.hit('auth', key)
+
+@app.route("/metrics")
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route("/telegram/webhook", methods=['POST'])
+def telegram_webhook():
+    secret = app.config['TELEGRAM_WEBHOOK_SECRET']
+    # Without a secret anyone could post updates as any chat, so the route
+    # stays closed until one is configured
+    if not secret or not hmac.compare_digest(
+            request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), secret):
+        return jsonify({'error': 'Invalid webhook secret'}), 403
+
+    update = request.get_json(silent=True)
+    if not isinstance(update, dict) or not isinstance(update.get('update_id'), int):
+        return jsonify({'error': 'Invalid update'}), 400
+
+    result = telegram_updates.offer(update)
+    if result == 'stopped':
+        return jsonify({'error': 'Bot is not running in webhook mode'}), 503
+    if result == 'busy':
+        # Telegram retries non-2xx deliveries, which is the backpressure we want
+        response = jsonify({'error': 'Update queue is full'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'status': result}), 200
+
 @app.route("/")
 def home():
     return jsonify({
@@ -139,7 +688,7 @@ def register():
     db.session.add(user)
     db.session.commit()
     
-    token = create_access_token(identity=str(user.id))
+    token = issue_token(user)
     return jsonify({'user': user.to_dict(), 'token': token})
 
 @app.route("/api/auth/login", methods=['POST'])
@@ -160,8 +709,12 @@ def login():
     
     if not user.is_active:
         return jsonify({'error': 'Account disabled'}), 403
+
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
     
-    token = create_access_token(identity=str(user.id))
+    token = issue_token(user)
     return jsonify({'user': user.to_dict(), 'token': token})
 
 @app.route("/api/auth/me", methods=['GET'])
@@ -176,6 +729,24 @@ def get_current_user():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route("/api/auth/logout-all", methods=['POST'])
+@jwt_required()
+def logout_all():
+    # Invalidates every token issued so far and hands back a fresh one
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get_or_404(current_user_id)
+        
+        TokenRevocation.revoke(db.session.connection(), current_user_id)
+        db.session.commit()
+        token_revocations.mark_stale()
+        
+        return jsonify({'message': 'Logged out everywhere', 'token': issue_token(user)}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @app.route("/api/auth/delete-account", methods=['DELETE'])
 @jwt_required()
 def delete_account():
@@ -183,6 +754,15 @@ def delete_account():
         current_user_id = int(get_jwt_identity())
         user = User.query.get_or_404(current_user_id)
         
+        user_task_ids = db.select(Task.id).filter(Task.user_id == current_user_id)
+        db.session.execute(task_tags.delete().where(task_tags.c.task_id.in_(user_task_ids)))
+        TaskReminder.query.filter(TaskReminder.task_id.in_(user_task_ids)).delete(synchronize_session=False)
+        Tag.query.filter_by(user_id=current_user_id).delete()
+        TaskCounter.query.filter_by(user_id=current_user_id).delete()
+        # Nobody can sync a deleted account, so its log goes too
+        TaskChange.query.filter_by(user_id=current_user_id).delete()
+        SyncClient.query.filter_by(user_id=current_user_id).delete()
+        ArchivedTask.query.filter_by(user_id=current_user_id).delete()
         Task.query.filter_by(user_id=current_user_id).delete()
         
         db.session.delete(user)
@@ -196,25 +776,395 @@ def delete_account():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+TASK_FIELDS = ('id', 'title', 'description', 'completed', 'priority', 'created_at',
+               'updated_at', 'due_date', 'user_id', 'status', 'tags')
+TASK_COLUMNS = tuple(getattr(Task, f) for f in TASK_FIELDS)
+ARCHIVED_TASK_COLUMNS = tuple(getattr(ArchivedTask, f) for f in TASK_FIELDS)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def parse_due_date(value):
+    # Stored as naive UTC like every other timestamp: an offset is converted,
+    # not dropped, so the value serialized before commit matches what is stored
+    due = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if due.tzinfo is not None:
+        due = due.astimezone(timezone.utc).replace(tzinfo=None)
+    return due
+
+def encode_cursor(created_at, task_id):
+    raw = f"{created_at.isoformat() if created_at else ''}|{task_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, task_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(task_id)
+    except (ValueError, UnicodeError):
+        return None
+
+@functools.lru_cache(maxsize=64)
+def row_serializer(fields):
+    # Selected rows start with ``fields`` in order; extra trailing columns are
+    # dropped by zip. Datetimes are left for the JSON provider to encode.
+    return lambda row: dict(zip(fields, row))
+
+def tagged_with(model, user_id, tags, tag_mode):
+    if model is ArchivedTask:
+        # Archived tasks have no task_tags links; match their JSON tag list
+        names = db.func.json_each(model.tags).table_valued('value')
+        matched = db.select(db.func.count()).select_from(names).filter(names.c.value.in_(tags)).scalar_subquery()
+        return matched == len(tags) if tag_mode == 'all' else matched > 0
+    tagged = (
+        db.select(task_tags.c.task_id)
+        .join(Tag, Tag.id == task_tags.c.tag_id)
+        .filter(Tag.user_id == user_id, Tag.name.in_(tags))
+    )
+    if tag_mode == 'all':
+        tagged = tagged.group_by(task_tags.c.task_id).having(
+            db.func.count(task_tags.c.tag_id) == len(tags))
+    return model.id.in_(tagged)
+
+def serialize_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def tasks_etag(user_id, resource):
+    version = db.session.query(User.tasks_version).filter_by(id=user_id).scalar()
+    if version is None:
+        return None
+    key = f"{user_id}:{version}:{resource}:{request.query_string.decode('latin-1')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def not_modified(etag):
+    if etag and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def with_etag(response, etag):
+    if etag:
+        response.set_etag(etag)
+    return response
+
 @app.route("/api/tasks", methods=['GET'])
 @jwt_required()
 def get_tasks():
     current_user_id = int(get_jwt_identity())
+    etag = tasks_etag(current_user_id, 'list')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     completed = request.args.get('completed')
     priority = request.args.get('priority')
-    
-    query = Task.query
-    
-    query = query.filter_by(user_id=current_user_id)
-    
-    if completed is not None:
-        completed_bool = completed.lower() == 'true'
-        query = query.filter_by(completed=completed_bool)
-    if priority:
-        query = query.filter_by(priority=priority)
-    
-    tasks = query.order_by(Task.created_at.desc()).all()
-    return jsonify([task.to_dict() for task in tasks])
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')
+
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in TASK_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    else:
+        fields = list(TASK_FIELDS)
+
+    paginate = limit is not None or cursor is not None
+    if paginate:
+        try:
+            limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+
+    tags = Task.parse_tags(request.args.get('tags', '').split(','))
+    tag_mode = request.args.get('tag_mode', 'any')
+    if tags and tag_mode not in ('any', 'all'):
+        return jsonify({'error': 'tag_mode must be any or all'}), 400
+
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+    # created_at and id are always selected so the keyset cursor can be built
+    selected = list(dict.fromkeys(fields + ['created_at', 'id']))
+
+    def task_query(model):
+        query = db.select(*[getattr(model, f) for f in selected]).filter(model.user_id == current_user_id)
+        if completed is not None:
+            completed_bool = completed.lower() == 'true'
+            query = query.filter(model.completed == completed_bool)
+        if priority:
+            query = query.filter(model.priority == priority)
+        if tags:
+            query = query.filter(tagged_with(model, current_user_id, tags, tag_mode))
+        if position:
+            created_at, task_id = position
+            if created_at is None:
+                query = query.filter(model.created_at.is_(None), model.id < task_id)
+            else:
+                query = query.filter(db.or_(
+                    model.created_at < created_at,
+                    db.and_(model.created_at == created_at, model.id < task_id),
+                    model.created_at.is_(None),
+                ))
+        return query
+
+    if request.args.get('include_archived', '').lower() == 'true':
+        # Both halves come off their (user_id, created_at, id) index in order
+        query = db.union_all(task_query(Task), task_query(ArchivedTask))
+    else:
+        query = task_query(Task)
+    columns = query.selected_columns
+    query = query.order_by(columns.created_at.desc(), columns.id.desc())
+    serialize = row_serializer(tuple(fields))
+    if not paginate:
+        return with_etag(jsonify([serialize(row) for row in db.session.execute(query)]), etag)
+
+    # fetch one extra row to know whether another page exists
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    tasks = [serialize(row) for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return with_etag(jsonify({'tasks': tasks, 'next_cursor': next_cursor}), etag)
+
+MAX_CHANGES_PAGE_SIZE = 1000
+
+@app.route("/api/tasks/changes", methods=['GET'])
+@jwt_required()
+def get_task_changes():
+    current_user_id = int(get_jwt_identity())
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', 500))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0:
+        return jsonify({'error': 'since must not be negative'}), 400
+    if limit < 1 or limit > MAX_CHANGES_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_CHANGES_PAGE_SIZE}'}), 400
+
+    floor = db.session.query(User.changes_floor).filter_by(id=current_user_id).scalar() or 0
+    if 0 < since < floor:
+        # Deletes after since may have been compacted away
+        return jsonify({'error': 'Change log compacted; discard local tasks and sync from since=0',
+                        'floor': floor}), 410
+
+    # Latest change per task after since, oldest first; tasks gone from the
+    # task table come back as deletes
+    latest = (
+        db.select(TaskChange.task_id, db.func.max(TaskChange.seq).label('seq'))
+        .filter(TaskChange.user_id == current_user_id, TaskChange.seq > since)
+        .group_by(TaskChange.task_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(*TASK_COLUMNS, latest.c.seq, latest.c.task_id.label('changed_task_id'))
+        .select_from(latest)
+        .outerjoin(Task, db.and_(Task.id == latest.c.task_id, Task.user_id == current_user_id))
+        .order_by(latest.c.seq)
+        .limit(limit + 1)
+    ).all()
+
+    serialize = row_serializer(TASK_FIELDS)
+    upserts, deletes = [], []
+    for row in rows[:limit]:
+        if row.id is None:
+            deletes.append(row.changed_task_id)
+        else:
+            upserts.append(serialize(row))
+    next_since = rows[:limit][-1].seq if rows else since
+    if deletes:
+        # Archived tasks left the task table but still exist
+        archived = db.session.execute(
+            db.select(*ARCHIVED_TASK_COLUMNS)
+            .filter(ArchivedTask.user_id == current_user_id, ArchivedTask.id.in_(deletes))).all()
+        upserts.extend(serialize(row) for row in archived)
+        archived_ids = {row.id for row in archived}
+        deletes = [task_id for task_id in deletes if task_id not in archived_ids]
+
+    client_id = request.args.get('client_id')
+    if client_id:
+        # Asking for changes since N confirms the client has everything up to N
+        upsert = sqlite_insert(SyncClient.__table__).values(
+            user_id=current_user_id, client_id=client_id[:64], last_seq=since, seen_at=datetime.utcnow())
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['user_id', 'client_id'],
+            set_={'last_seq': upsert.excluded.last_seq, 'seen_at': upsert.excluded.seen_at}))
+        db.session.commit()
+
+    return jsonify({'upserts': upserts, 'deletes': deletes, 'next_since': next_since,
+                    'has_more': len(rows) > limit})
+
+EXPORT_BATCH_SIZE = 500
+
+@app.route("/api/tasks/summary", methods=['GET'])
+@jwt_required()
+def get_task_summary():
+    current_user_id = int(get_jwt_identity())
+    now = datetime.utcnow()
+    today = now.date()
+    week_end = (today + timedelta(days=7)).isoformat()
+
+    summary = {'total': 0, 'completed': 0, 'open': 0, 'by_status': {}, 'by_priority': {},
+               'overdue': 0, 'due_this_week': 0}
+    if TaskCounter.roll_overdue(current_user_id, today):
+        db.session.commit()
+    due_today = 0
+    # Three primary key ranges: the keys sorting before and after the "due:"
+    # rows, and only this week's deadline days in between, so later deadlines
+    # are never read
+    def counter_range(*conditions):
+        return db.select(TaskCounter.key, TaskCounter.count).filter(
+            TaskCounter.user_id == current_user_id, *conditions)
+
+    key = TaskCounter.key
+    counters = db.session.execute(db.union_all(
+        counter_range(key < 'due:'),
+        counter_range(key >= f'due:{today.isoformat()}', key < f'due:{week_end}'),
+        counter_range(key >= 'due;')))
+    for key, count in counters:
+        kind, _, value = key.partition(':')
+        if kind == 'total':
+            summary['total'] = count
+        elif kind == 'status':
+            summary['by_status'][value] = count
+        elif kind == 'priority':
+            summary['by_priority'][value] = count
+        elif kind == 'completed':
+            summary['completed' if value == 'true' else 'open'] = count
+        elif kind == 'overdue':
+            summary['overdue'] += count
+        elif kind == 'due':
+            if value == today.isoformat():
+                due_today = count
+            else:
+                summary['due_this_week'] += count
+
+    if due_today:
+        # Only today's deadlines need a look at the clock; that's a short indexed range
+        overdue_today = Task.query.filter(
+            Task.user_id == current_user_id, Task.completed.is_(False),
+            Task.due_date >= datetime.combine(today, datetime.min.time()), Task.due_date < now).count()
+        summary['overdue'] += overdue_today
+        summary['due_this_week'] += due_today - overdue_today
+    return jsonify(summary)
+
+@app.route("/api/tasks/search", methods=['GET'])
+@jwt_required()
+def search_tasks():
+    try:
+        current_user_id = int(get_jwt_identity())
+        params = search_params(request.args.get('q', ''), current_user_id)
+        if params is None:
+            return jsonify({'error': 'q must contain at least one word'}), 400
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'limit must be between 1 and 100'}), 400
+
+        rows = db.session.execute(
+            SEARCH_SQL, {**params, 'limit': limit, 'candidates': SEARCH_CANDIDATES}).mappings()
+        return jsonify({'results': [
+            dict(row, title_highlight=mark_matches(row['title_highlight']), snippet=mark_matches(row['snippet']))
+            for row in rows]})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/api/tasks/export", methods=['GET'])
+@jwt_required()
+def export_tasks():
+    current_user_id = int(get_jwt_identity())
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    # An export is a backup, so archived tasks are always included
+    query = db.union_all(
+        db.select(*TASK_COLUMNS).filter(Task.user_id == current_user_id),
+        db.select(*ARCHIVED_TASK_COLUMNS).filter(ArchivedTask.user_id == current_user_id),
+    )
+    columns = query.selected_columns
+    query = query.order_by(columns.created_at.desc(), columns.id.desc()) \
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    serialize = row_serializer(TASK_FIELDS)
+
+    def generate_ndjson():
+        for row in db.session.execute(query):
+            yield app.json.dumps(serialize(row)) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(TASK_FIELDS)
+        for row in db.session.execute(query):
+            writer.writerow([serialize_value(v) for v in row])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=tasks.{export_format}'},
+    )
+
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.route("/api/tasks/stream", methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_tasks():
+    current_user_id = int(get_jwt_identity())
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+
+    sub, missed = broker.subscribe(current_user_id, last_event_id)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            if missed is None:
+                # Too far behind for the replay buffer; the client must re-fetch
+                yield 'event: reset\ndata: {}\n\n'
+            else:
+                for event in missed:
+                    yield format_sse(event)
+            while not sub.overflowed:
+                try:
+                    yield format_sse(sub.get(timeout=SSE_KEEPALIVE_SECONDS))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            broker.unsubscribe(sub)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 @app.route("/api/tasks", methods=['POST'])
 @jwt_required()
@@ -237,49 +1187,271 @@ def create_task():
             priority=data.get('priority', 'medium'),
             user_id=user_id,
             status= data.get('status','todo'),
-            tags= data.get('tags',''),
+            tags= json.dumps(Task.parse_tags(data.get('tags'))),
         )
         
         if 'due_date' in data and data['due_date']:
             try:
-                task.due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
+                task.due_date = parse_due_date(data['due_date'])
             except ValueError:
                 return jsonify({'error': 'Invalid due_date format. Use ISO format.'}), 400
         
         db.session.add(task)
+        db.session.flush()
+        Task.sync_tags(user_id, [(task.id, None, task.tags)])
+        TaskCounter.apply(user_id, after=[task])
+        Task.log_changes(user_id, [task.id], 'upsert')
+        User.bump_tasks_version(user_id)
+        # Serialized before commit: afterwards the instance is expired and would be re-SELECTed
+        task_data = task.to_dict()
         db.session.commit()
-        
-        return jsonify(task.to_dict()), 201
+
+        broker.publish(user_id, 'created', task_data)
+        return jsonify(task_data), 201
     
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+MAX_BATCH_SIZE = 1000
+UPDATABLE_FIELDS = ('title', 'description', 'completed', 'priority', 'status', 'tags', 'due_date')
+
+def parse_batch_item(item, partial=False):
+    if not isinstance(item, dict):
+        return None, 'Each item must be an object'
+    if not partial and not item.get('title'):
+        return None, 'Title is required'
+
+    if partial:
+        values = {k: item[k] for k in UPDATABLE_FIELDS if k in item}
+        if not values:
+            return None, 'No data provided'
+    else:
+        values = {
+            'title': item['title'],
+            'description': item.get('description', ''),
+            'priority': item.get('priority', 'medium'),
+            'status': item.get('status', 'todo'),
+            'tags': item.get('tags'),
+            'due_date': item.get('due_date'),
+        }
+    # Checked here, not by the database, so one bad item rejects the batch with a 400
+    for field in ('title', 'priority', 'status'):
+        if field in values and not isinstance(values[field], str):
+            return None, f'{field} must be a string'
+    if values.get('description') is not None and not isinstance(values['description'], str):
+        return None, 'description must be a string'
+    if 'completed' in values and not isinstance(values['completed'], bool):
+        return None, 'completed must be true or false'
+    if 'tags' in values:
+        values['tags'] = json.dumps(Task.parse_tags(values['tags']))
+
+    if values.get('due_date'):
+        try:
+            values['due_date'] = parse_due_date(values['due_date'])
+        except (ValueError, AttributeError):
+            return None, 'Invalid due_date format. Use ISO format.'
+    elif 'due_date' in values:
+        values['due_date'] = None
+    return values, None
+
+def read_batch(data, key):
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f"'{key}' must be a non-empty list"}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify({'error': f'At most {MAX_BATCH_SIZE} items per batch'}), 400)
+    return items, None
+
+def batch_rejected(results):
+    return jsonify({'error': 'Batch rejected, no changes were applied', 'results': results}), 400
+
+@app.route("/api/tasks/batch", methods=['POST'])
+@jwt_required()
+def create_tasks_batch():
+    try:
+        current_user_id = int(get_jwt_identity())
+        items, error = read_batch(request.get_json(silent=True), 'tasks')
+        if error:
+            return error
+
+        rows, results = [], []
+        for index, item in enumerate(items):
+            values, message = parse_batch_item(item)
+            if message:
+                results.append({'index': index, 'status': 'error', 'error': message})
+            else:
+                values['user_id'] = current_user_id
+                rows.append(values)
+                results.append({'index': index, 'status': 'ok'})
+        if any(result['status'] == 'error' for result in results):
+            return batch_rejected(results)
+
+        created = Task.insert_many(rows)
+        Task.sync_tags(current_user_id, [(task.id, None, task.tags) for task in created])
+        TaskCounter.apply(current_user_id, after=created)
+        Task.log_changes(current_user_id, [task.id for task in created], 'upsert')
+        User.bump_tasks_version(current_user_id)
+        for result, task in zip(results, created):
+            result['task'] = task.to_dict()
+        db.session.commit()
+
+        for result in results:
+            broker.publish(current_user_id, 'created', result['task'])
+        return jsonify({'results': results}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/api/tasks/batch", methods=['PATCH'])
+@jwt_required()
+def update_tasks_batch():
+    try:
+        current_user_id = int(get_jwt_identity())
+        items, error = read_batch(request.get_json(silent=True), 'tasks')
+        if error:
+            return error
+
+        requested = [item.get('id') for item in items if isinstance(item, dict)]
+        owned = {row.id: row for row in db.session.execute(
+            db.select(Task.id, Task.tags, Task.status, Task.priority, Task.completed, Task.due_date)
+            .filter(Task.id.in_([i for i in requested if isinstance(i, int)]), Task.user_id == current_user_id))}
+        archived = set(db.session.scalars(
+            db.select(ArchivedTask.id).filter(
+                ArchivedTask.id.in_([i for i in requested if isinstance(i, int) and i not in owned]),
+                ArchivedTask.user_id == current_user_id)))
+
+        now = datetime.utcnow()
+        rows, results, seen = [], [], set()
+        for index, item in enumerate(items):
+            values, message = parse_batch_item(item, partial=True)
+            task_id = item.get('id') if isinstance(item, dict) else None
+            if not message and isinstance(task_id, int) and task_id in archived:
+                message = 'Archived tasks are read-only'
+            if not message and not (isinstance(task_id, int) and task_id in owned):
+                message = 'Task not found'
+            if not message and task_id in seen:
+                # Every item is diffed against the same snapshot of the task
+                message = 'Duplicate id; merge the changes into one item'
+            if message:
+                results.append({'index': index, 'id': task_id, 'status': 'error', 'error': message})
+            else:
+                seen.add(task_id)
+                values.update(id=task_id, updated_at=now)
+                rows.append(values)
+                results.append({'index': index, 'id': task_id, 'status': 'ok'})
+        if any(result['status'] == 'error' for result in results):
+            return batch_rejected(results)
+
+        db.session.execute(db.update(Task), rows)
+        Task.sync_tags(current_user_id, [(row['id'], owned[row['id']].tags, row['tags'])
+                                         for row in rows if 'tags' in row])
+        TaskCounter.apply(current_user_id,
+                          before=[owned[row['id']] for row in rows],
+                          after=[SimpleNamespace(**{**owned[row['id']]._asdict(), **row}) for row in rows])
+        Task.log_changes(current_user_id, [row['id'] for row in rows], 'upsert')
+        User.bump_tasks_version(current_user_id)
+        updated = [{f: serialize_value(v) for f, v in zip(TASK_FIELDS, row)} for row in db.session.execute(
+            db.select(*TASK_COLUMNS).filter(Task.id.in_([row['id'] for row in rows])))]
+        db.session.commit()
+
+        for task_data in updated:
+            broker.publish(current_user_id, 'updated', task_data)
+        return jsonify({'results': results}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route("/api/tasks/batch", methods=['DELETE'])
+@jwt_required()
+def delete_tasks_batch():
+    try:
+        current_user_id = int(get_jwt_identity())
+        ids, error = read_batch(request.get_json(silent=True), 'ids')
+        if error:
+            return error
+
+        requested = [i for i in ids if isinstance(i, int)]
+        owned = {row.id: row for row in db.session.execute(
+            db.select(Task.id, Task.tags, Task.status, Task.priority, Task.completed, Task.due_date)
+            .filter(Task.id.in_(requested), Task.user_id == current_user_id))}
+        archived = set(db.session.scalars(
+            db.select(ArchivedTask.id).filter(ArchivedTask.id.in_([i for i in requested if i not in owned]),
+                                              ArchivedTask.user_id == current_user_id)))
+        found = owned.keys() | archived
+        results = [{'id': task_id, 'status': 'ok'} if isinstance(task_id, int) and task_id in found
+                   else {'id': task_id, 'status': 'error', 'error': 'Task not found'}
+                   for task_id in ids]
+        if any(result['status'] == 'error' for result in results):
+            return batch_rejected(results)
+
+        Task.sync_tags(current_user_id, [(row.id, row.tags, None) for row in owned.values()])
+        TaskCounter.apply(current_user_id, before=owned.values())
+        Task.query.filter(Task.id.in_(owned), Task.user_id == current_user_id).delete(
+            synchronize_session=False)
+        ArchivedTask.query.filter(ArchivedTask.id.in_(archived), ArchivedTask.user_id == current_user_id).delete(
+            synchronize_session=False)
+        deleted = list(owned) + sorted(archived)
+        TaskReminder.query.filter(TaskReminder.task_id.in_(deleted)).delete(synchronize_session=False)
+        Task.log_changes(current_user_id, deleted, 'delete')
+        User.bump_tasks_version(current_user_id)
+        db.session.commit()
+
+        for task_id in deleted:
+            broker.publish(current_user_id, 'deleted', {'id': task_id})
+        return jsonify({'results': results}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @app.route("/api/tasks/<int:task_id>", methods=['GET'])
 @jwt_required()
 def get_task(task_id):
     current_user_id = int(get_jwt_identity())
-    task = Task.query.get_or_404(task_id)
+    etag = tasks_etag(current_user_id, f'task:{task_id}')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    task = db.session.execute(
+        db.select(*TASK_COLUMNS).filter(Task.id == task_id)).first()
+    if task is None:
+        task = db.session.execute(
+            db.select(*ARCHIVED_TASK_COLUMNS).filter(ArchivedTask.id == task_id)).first()
+    if task is None:
+        abort(404)
     
     if task.user_id != current_user_id:
         return jsonify({'error': 'Access denied. You can only view your own tasks.'}), 403
     
-    return jsonify(task.to_dict())
+    return with_etag(jsonify(row_serializer(TASK_FIELDS)(task)), etag)
 
 @app.route("/api/tasks/<int:task_id>", methods=['PUT'])
 @jwt_required()
 def update_task(task_id):
     try:
         current_user_id = int(get_jwt_identity())
-        task = Task.query.get_or_404(task_id)
+        task = db.session.get(Task, task_id) or db.session.get(ArchivedTask, task_id)
+        if task is None:
+            return jsonify({'error': 'Task not found'}), 404
         
         if task.user_id != current_user_id:
             return jsonify({'error': 'Access denied. You can only update your own tasks.'}), 403
+        if isinstance(task, ArchivedTask):
+            return jsonify({'error': 'Archived tasks are read-only'}), 409
         
         data = request.get_json()
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
+        if 'completed' in data and not isinstance(data['completed'], bool):
+            return jsonify({'error': 'completed must be true or false'}), 400
+
+        before = SimpleNamespace(status=task.status, priority=task.priority,
+                                 completed=task.completed, due_date=task.due_date)
         
         if 'title' in data:
             task.title = data['title']
@@ -293,19 +1465,28 @@ def update_task(task_id):
             task.priority = data['priority']
         if 'status' in data:
             task.status = data['status']
+        if 'tags' in data:
+            tags = json.dumps(Task.parse_tags(data['tags']))
+            Task.sync_tags(current_user_id, [(task.id, task.tags, tags)])
+            task.tags = tags
         if 'due_date' in data:
             if data['due_date']:
                 try:
-                    task.due_date = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
+                    task.due_date = parse_due_date(data['due_date'])
                 except ValueError:
                     return jsonify({'error': 'Invalid due_date format. Use ISO format.'}), 400
             else:
                 task.due_date = None
         
         task.updated_at = datetime.utcnow()
+        TaskCounter.apply(current_user_id, before=[before], after=[task])
+        Task.log_changes(current_user_id, [task.id], 'upsert')
+        User.bump_tasks_version(current_user_id)
+        task_data = task.to_dict()
         db.session.commit()
-        
-        return jsonify(task.to_dict())
+
+        broker.publish(current_user_id, 'updated', task_data)
+        return jsonify(task_data)
     
     except Exception as e:
         db.session.rollback()
@@ -316,19 +1497,45 @@ def update_task(task_id):
 def delete_task(task_id):
     try:
         current_user_id = int(get_jwt_identity())
-        task = Task.query.get_or_404(task_id)
+        task = db.session.get(Task, task_id) or db.session.get(ArchivedTask, task_id)
+        if task is None:
+            return jsonify({'error': 'Task not found'}), 404
         
         if task.user_id != current_user_id:
             return jsonify({'error': 'Access denied. You can only delete your own tasks.'}), 403
         
+        if isinstance(task, Task):
+            # Archived tasks have no tag links or counters to update
+            Task.sync_tags(current_user_id, [(task.id, task.tags, None)])
+            TaskCounter.apply(current_user_id, before=[task])
         db.session.delete(task)
+        TaskReminder.query.filter(TaskReminder.task_id == task_id).delete(synchronize_session=False)
+        Task.log_changes(current_user_id, [task_id], 'delete')
+        User.bump_tasks_version(current_user_id)
         db.session.commit()
+        broker.publish(current_user_id, 'deleted', {'id': task_id})
         return jsonify({'message': 'Task deleted successfully'}), 200
     
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route("/api/tags", methods=['GET'])
+@jwt_required()
+def get_tags():
+    current_user_id = int(get_jwt_identity())
+    tags = Tag.query.filter_by(user_id=current_user_id).order_by(Tag.name).all()
+    return jsonify([tag.to_dict() for tag in tags])
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(error):
+    db.session.rollback()
+    return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
+
+@app.errorhandler(RateLimited)
+def rate_limited(error):
+    return jsonify({'error': 'Too many requests, please slow down'}), 429, {'Retry-After': error.retry_after_header}
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Resource not found'}), 404
@@ -346,6 +1553,22 @@ def expired_token_callback(jwt_header, jwt_payload):
 def invalid_token_callback(error):
     return jsonify({'error': 'Invalid token'}), 401
 
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    user_id = int(jwt_payload['sub'])
+    # In-memory check, the database is only read on the periodic refresh
+    if token_revocations.is_revoked(user_id, jwt_payload):
+        return True
+    # Called once per authenticated request, right after the signature check,
+    # so the user's bucket is charged here rather than decoding the token twice
+    if not request.path.startswith('/api/auth/'):
+        rate_limiter.hit('read' if request.method in ('GET', 'HEAD') else 'write', user_id)
+    return False
+
+@jwt.revoked_token_loader
+def revoked_token_callback(jwt_header, jwt_payload):
+    return jsonify({'error': 'Token has been revoked'}), 401
+
 @jwt.unauthorized_loader
 def missing_token_callback(error):
     return jsonify({'error': 'Authorization token is required'}), 401
@@ -354,8 +1577,17 @@ if __name__ == "__main__":
     import asyncio
     import threading
     
+    archiving = app.config['ARCHIVE_AFTER_DAYS'] > 0
     if os.getenv('TELEGRAM_BOT_TOKEN'):
-        async def run_polling():
+        if archiving:
+            task_archiver.start()
+        webhook_mode = app.config['BOT_MODE'] == 'webhook'
+        if webhook_mode and not app.config['TELEGRAM_WEBHOOK_URL']:
+            raise SystemExit("BOT_MODE=webhook needs TELEGRAM_WEBHOOK_URL")
+        if webhook_mode and not app.config['TELEGRAM_WEBHOOK_SECRET']:
+            raise SystemExit("BOT_MODE=webhook needs TELEGRAM_WEBHOOK_SECRET")
+
+        async def run_bot():
             def run_flask():
                 app.run(debug=False, host='0.0.0.0', port=5001, use_reloader=False)
             
@@ -363,17 +1595,46 @@ if __name__ == "__main__":
             flask_thread.start()
             
             from bot import TaskBot
+            from reminders import ReminderScheduler
             
             with app.app_context():
-                bot = TaskBot(app, db, User, Task)
+                bot = TaskBot(app, db, User, Task, password_hasher, TaskCounter, rate_limiter=rate_limiter)
+                reminders = ReminderScheduler(
+                    bot, db, Task, User, TaskReminder, broker,
+                    lead=timedelta(minutes=app.config['REMINDER_LEAD_MINUTES']),
+                    rate_per_second=app.config['REMINDER_RATE_PER_SECOND'],
+                )
+                reminder_task = None
+                registry.register(Gauge('bot_commit_queue', 'Group commit statistics for chat-created tasks',
+                                        lambda: {(k,): v for k, v in bot.task_queue.stats().items()}, ('stat',)))
+                registry.register(Gauge('reminders_sent', 'Deadline reminders sent since start',
+                                        lambda: reminders.sent))
+                registry.register(Gauge('reminder_failures', 'Failed reminder passes since start',
+                                        lambda: reminders.failures))
                 
                 try:
                     await bot.initialize()
-                    await bot.application.bot.delete_webhook()
 
                     await bot.application.initialize()
                     await bot.application.start()
-                    await bot.application.updater.start_polling(drop_pending_updates=True)
+                    if webhook_mode:
+                        # Telegram POSTs updates to /telegram/webhook; the Flask
+                        # thread queues them for the workers on this loop
+                        await telegram_updates.start(
+                            bot.process_update_data,
+                            workers=app.config['BOT_WEBHOOK_WORKERS'],
+                            max_pending=app.config['BOT_WEBHOOK_MAX_PENDING'],
+                        )
+                        await bot.application.bot.set_webhook(
+                            app.config['TELEGRAM_WEBHOOK_URL'],
+                            secret_token=app.config['TELEGRAM_WEBHOOK_SECRET'],
+                            max_connections=100,
+                            drop_pending_updates=True,
+                        )
+                    else:
+                        await bot.application.bot.delete_webhook()
+                        await bot.application.updater.start_polling(drop_pending_updates=True)
+                    reminder_task = asyncio.create_task(reminders.run())
                     
                     try:
                         while True:
@@ -389,22 +1650,31 @@ if __name__ == "__main__":
                     print("\nShutting down...")
 
                     try:
-                        if hasattr(bot.application.updater, 'stop'):
+                        if reminder_task:
+                            reminder_task.cancel()
+                        await telegram_updates.stop()
+                        await bot.task_queue.drain()
+                        if bot.application.updater.running:
                             await bot.application.updater.stop()
                         if hasattr(bot.application, 'stop'):
                             await bot.application.stop()
                         if hasattr(bot.application, 'shutdown'):
                             await bot.application.shutdown()
+                        bot.db_executor.shutdown(wait=False)
+                        task_archiver.stop()
                         print("Bot stopped successfully.")
                     except Exception as e:
                         print(f"Shutdown warning: {e}")
         
         try:
-            asyncio.run(run_polling())
+            asyncio.run(run_bot())
         except KeyboardInterrupt:
             print("\nBoth services stopped by user.")
         except Exception as e:
             print(f"Unexpected error: {e}")
     else:
         print("TELEGRAM_BOT_TOKEN not found - running Flask only")
+        if archiving and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            # Only in the reloader's child, which is the process serving requests
+            task_archiver.start()
         app.run(debug=True, host='0.0.0.0', port=5001)
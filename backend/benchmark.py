@@ -0,0 +1,896 @@
+#!/usr/bin/env python3
+"""Load test for the API and the Telegram bot.
+
+Seeds a database (see ``init_db.seed_db``), runs a weighted mix of API calls
+from concurrent workers, then replays synthetic Telegram updates through
+``TaskBot`` with Bot API calls answered locally. Prints (or writes) JSON with
+throughput and p50/p95/p99 latency per operation, so runs can be compared
+across commits:
+
+    python benchmark.py --users 50 --tasks-per-user 200 --workers 8 --duration 20 -o before.json
+
+By default everything runs in-process against a fresh temporary SQLite
+database. ``--url`` sends the API workload to a running server instead (seed
+its database first with ``init_db.py --seed``); the bot replay always runs
+in-process against ``--database``; ``--bot-mode`` compares feeding it through
+the polling update queue with the webhook route.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DEFAULT_MIX = 'list=40,create=20,update=20,delete=10,summary=5,login=5'
+PROFILE_MIX = 'list=40,create=20,update=20,delete=10,summary=10'
+SEARCH_QUERIES = ['meet', 'meeting', 'dep', 'budget report', 'groceries inv', 'zebra']
+BOT_MIX = {'message': 70, 'tasks': 20, 'new': 10}
+CHAT_MESSAGES = [
+    "Finish essay tomorrow 5pm #uni urgent",
+    "buy milk",
+    "call the dentist next friday",
+    "Prepare slides in 3 days #work",
+    "renew passport someday",
+    "pay rent by 2026-12-01 #finance important",
+    "email the landlord tonight",
+    "review pull request at 14:30 #work wip",
+]
+
+
+def percentile(values, fraction):
+    # Nearest-rank on a sorted list
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(samples, errors, elapsed):
+    result = {}
+    for op in sorted(set(samples) | set(errors)):
+        values = sorted(samples.get(op, []))
+        entry = {'count': len(values), 'errors': errors.get(op, 0),
+                 'throughput_per_s': round(len(values) / elapsed, 1) if elapsed else 0.0}
+        if values:
+            entry.update({
+                'mean_ms': round(sum(values) / len(values) * 1000, 3),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3),
+            })
+        result[op] = entry
+    total = sum(len(v) for v in samples.values())
+    return {'duration_s': round(elapsed, 3), 'operations': total,
+            'throughput_per_s': round(total / elapsed, 1) if elapsed else 0.0, 'ops': result}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+class TestClient:
+    """In-process client on top of Flask's test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """Client for a running server, standard library only."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json', **(headers or {})})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+
+class ApiWorker:
+    def __init__(self, client, email, password, rng):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.rng = rng
+        self.headers = None
+        self.task_ids = []
+        self.created = []
+
+    def login(self):
+        status, body = self.client.request('POST', '/api/auth/login',
+                                           {'email': self.email, 'password': self.password})
+        if status != 200:
+            return False
+        self.headers = {'Authorization': 'Bearer ' + body['token']}
+        return True
+
+    def setup(self):
+        if not self.login():
+            raise RuntimeError(f"Could not log in as {self.email}")
+        status, body = self.client.request('GET', '/api/tasks?limit=200&fields=id', headers=self.headers)
+        self.task_ids = [task['id'] for task in body['tasks']] if status == 200 else []
+
+    def list(self):
+        status, _ = self.client.request('GET', '/api/tasks?limit=50', headers=self.headers)
+        return status == 200
+
+    def summary(self):
+        status, _ = self.client.request('GET', '/api/tasks/summary', headers=self.headers)
+        return status == 200
+
+    def create(self):
+        status, body = self.client.request('POST', '/api/tasks', {
+            'title': f'Benchmark task {self.rng.randint(0, 10 ** 6)}',
+            'description': 'created by benchmark.py',
+            'priority': self.rng.choice(['low', 'medium', 'high']),
+            'tags': json.dumps(self.rng.sample(['work', 'home', 'bench'], 2)),
+        }, headers=self.headers)
+        if status != 201:
+            return False
+        self.created.append(body['id'])
+        return True
+
+    def update(self):
+        ids = self.created or self.task_ids
+        if not ids:
+            return self.create()
+        status, _ = self.client.request('PUT', f'/api/tasks/{self.rng.choice(ids)}', {
+            'completed': self.rng.random() < 0.5,
+            'priority': self.rng.choice(['low', 'medium', 'high']),
+        }, headers=self.headers)
+        return status == 200
+
+    def delete(self):
+        if not self.created:
+            return self.create()
+        status, _ = self.client.request('DELETE', f'/api/tasks/{self.created.pop()}', headers=self.headers)
+        return status == 200
+
+
+def run_api_workload(make_client, emails, password, mix, workers, duration, seed):
+    samples, errors = defaultdict(list), defaultdict(int)
+    lock = threading.Lock()
+    ops, weights = list(mix), list(mix.values())
+    stop_at = []
+
+    def work(index):
+        rng = random.Random(seed + index)
+        worker = ApiWorker(make_client(), emails[index % len(emails)], password, rng)
+        worker.setup()
+        local, local_errors = defaultdict(list), defaultdict(int)
+        while time.perf_counter() < stop_at[0]:
+            op = rng.choices(ops, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(worker, op)()
+            except Exception:
+                ok = False
+            if ok:
+                local[op].append(time.perf_counter() - started)
+            else:
+                local_errors[op] += 1
+        with lock:
+            for op, values in local.items():
+                samples[op].extend(values)
+            for op, count in local_errors.items():
+                errors[op] += count
+
+    started = time.perf_counter()
+    stop_at.append(started + duration)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(work, i) for i in range(workers)]:
+            future.result()
+    return summarize(samples, errors, time.perf_counter() - started)
+
+
+def make_bench_request():
+    from telegram.request import BaseRequest
+
+    class BenchRequest(BaseRequest):
+        """Answers Bot API calls locally so the bot can be driven without Telegram."""
+
+        def __init__(self):
+            self.calls = defaultdict(int)
+            self._message_id = 0
+
+        @property
+        def read_timeout(self):
+            return None
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None,
+                             write_timeout=None, connect_timeout=None, pool_timeout=None):
+            endpoint = url.rsplit('/', 1)[-1]
+            self.calls[endpoint] += 1
+            params = request_data.parameters if request_data else {}
+            if endpoint == 'getMe':
+                result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+            elif endpoint in ('sendMessage', 'editMessageText'):
+                self._message_id += 1
+                result = {'message_id': self._message_id, 'date': int(time.time()),
+                          'chat': {'id': params.get('chat_id', 1), 'type': 'private'},
+                          'text': params.get('text', '')}
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+    return BenchRequest()
+
+
+def command_update(update_id, telegram_id, text):
+    message = {
+        'message_id': update_id, 'date': int(time.time()), 'text': text,
+        'chat': {'id': telegram_id, 'type': 'private'},
+        'from': {'id': telegram_id, 'is_bot': False, 'first_name': 'Bench'},
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def bot_update_stream(telegram_ids, count, seed):
+    rng = random.Random(seed)
+    kinds, weights = list(BOT_MIX), list(BOT_MIX.values())
+    for update_id in range(1, count + 1):
+        kind = rng.choices(kinds, weights)[0]
+        text = {'message': rng.choice(CHAT_MESSAGES), 'tasks': '/tasks',
+                'new': '/new ' + rng.choice(CHAT_MESSAGES)}[kind]
+        yield kind, command_update(update_id, rng.choice(telegram_ids), text)
+
+
+async def replay_bot_updates(bot, telegram_ids, count, concurrency, seed, mode='direct', flask_app=None):
+    """Feed ``count`` updates to the bot and time each one until its handlers finish.
+
+    ``direct`` awaits ``process_update`` under a semaphore; ``polling`` puts
+    them on the application's update queue as the Updater does after
+    getUpdates; ``webhook`` POSTs their JSON to /telegram/webhook from
+    ``concurrency`` threads, retrying when the route answers 503.
+    """
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from webhook import telegram_updates
+
+    updates = list(bot_update_stream(telegram_ids, count, seed))
+    kind_of = {data['update_id']: kind for kind, data in updates}
+    samples, errors = defaultdict(list), defaultdict(int)
+    submitted = {}
+    application = bot.application
+    loop = asyncio.get_running_loop()
+    all_done = asyncio.Event()
+    finished = 0
+    retries = 0
+
+    async def record_done(update, context):
+        nonlocal finished
+        samples[kind_of[update.update_id]].append(time.perf_counter() - submitted[update.update_id])
+        finished += 1
+        if finished == count:
+            all_done.set()
+
+    # Runs after the bot's own handlers (group 0) for every update
+    application.add_handler(TypeHandler(Update, record_done), group=1000)
+    await bot.initialize()
+    started = time.perf_counter()
+
+    if mode == 'direct':
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def handle(kind, data):
+            async with semaphore:
+                submitted[data['update_id']] = time.perf_counter()
+                try:
+                    await application.process_update(Update.de_json(data, application.bot))
+                except Exception:
+                    errors[kind] += 1
+
+        await asyncio.gather(*(handle(kind, data) for kind, data in updates))
+    elif mode == 'polling':
+        await application.start()
+        for _, data in updates:
+            submitted[data['update_id']] = time.perf_counter()
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        await all_done.wait()
+    else:
+        await application.start()
+        await telegram_updates.start(bot.process_update_data, workers=flask_app.config['BOT_WEBHOOK_WORKERS'],
+                                     max_pending=flask_app.config['BOT_WEBHOOK_MAX_PENDING'])
+        client = flask_app.test_client()
+        headers = {'X-Telegram-Bot-Api-Secret-Token': flask_app.config['TELEGRAM_WEBHOOK_SECRET']}
+
+        def post(data):
+            nonlocal retries
+            submitted[data['update_id']] = time.perf_counter()
+            while True:
+                response = client.post('/telegram/webhook', json=data, headers=headers)
+                if response.status_code != 503:
+                    return response.status_code
+                retries += 1
+                time.sleep(0.1)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = await asyncio.gather(*(loop.run_in_executor(pool, post, data) for _, data in updates))
+        for (kind, _), status in zip(updates, statuses):
+            if status != 200:
+                errors[kind] += 1
+        await all_done.wait()
+
+    await bot.task_queue.drain()
+    elapsed = time.perf_counter() - started
+    if mode == 'webhook':
+        await telegram_updates.stop()
+    if application.running:
+        await application.stop()
+    await application.shutdown()
+    result = summarize(samples, errors, elapsed)
+    result['mode'] = mode
+    result['commit_queue'] = bot.task_queue.stats()
+    if mode == 'webhook':
+        result['webhook'] = dict(telegram_updates.stats(), retries=retries)
+    return result
+
+
+def run_serialization_benchmark(app, db, Task, user_id, repeat=5):
+    """Time serializing all of one user's tasks to a JSON body: ORM objects with
+    ``to_dict()`` and the stdlib encoder versus column tuples, ``row_serializer``
+    and the app's JSON provider."""
+    from app import TASK_COLUMNS, TASK_FIELDS, row_serializer
+    from fastjson import orjson
+
+    def orm_path():
+        tasks = Task.query.filter_by(user_id=user_id).order_by(Task.created_at.desc(), Task.id.desc()).all()
+        return json.dumps([task.to_dict() for task in tasks], sort_keys=True)
+
+    def column_path():
+        serialize = row_serializer(TASK_FIELDS)
+        rows = db.session.execute(db.select(*TASK_COLUMNS).filter(Task.user_id == user_id)
+                                  .order_by(Task.created_at.desc(), Task.id.desc()))
+        return app.json.dumps([serialize(row) for row in rows])
+
+    result = {'json_backend': 'orjson' if orjson is not None else 'json'}
+    with app.app_context():
+        for name, fn in (('orm_to_dict', orm_path), ('columns_fast_json', column_path)):
+            timings = []
+            for _ in range(repeat):
+                db.session.expunge_all()
+                started = time.perf_counter()
+                body = fn()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            result[name] = {'tasks': len(json.loads(body)), 'best_ms': round(timings[0] * 1000, 3),
+                            'median_ms': round(timings[len(timings) // 2] * 1000, 3)}
+    result['speedup'] = round(result['orm_to_dict']['median_ms'] / result['columns_fast_json']['median_ms'], 2)
+    return result
+
+
+@contextlib.contextmanager
+def counted_sql(app, db):
+    """Count statements sent to SQLite: {'statements': n, 'task_inserts': n}."""
+    from sqlalchemy import event
+
+    counts = {'statements': 0, 'task_inserts': 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counts['statements'] += 1
+        if statement.startswith('INSERT INTO task ('):
+            counts['task_inserts'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        yield counts
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+def run_batch_benchmark(app, db, email, password, count, seed):
+    """Create ``count`` tasks with one POST /api/tasks each, then the same tasks
+    with POST /api/tasks/batch (1000 per call), and count the SQL each path runs."""
+    from app import MAX_BATCH_SIZE
+
+    rng = random.Random(seed)
+    worker = ApiWorker(TestClient(app), email, password, rng)
+    if not worker.login():
+        raise RuntimeError(f"Could not log in as {email}")
+    tasks = [{'title': f'Batch benchmark task {i}', 'description': 'created by benchmark.py',
+              'priority': rng.choice(['low', 'medium', 'high']), 'tags': rng.sample(['work', 'home', 'bench'], 2)}
+             for i in range(count)]
+
+    def single():
+        for task in tasks:
+            status, _ = worker.client.request('POST', '/api/tasks', task, headers=worker.headers)
+            if status != 201:
+                raise RuntimeError(f"POST /api/tasks answered {status}")
+        return count
+
+    def batch():
+        for start in range(0, count, MAX_BATCH_SIZE):
+            status, _ = worker.client.request('POST', '/api/tasks/batch',
+                                              {'tasks': tasks[start:start + MAX_BATCH_SIZE]}, headers=worker.headers)
+            if status != 201:
+                raise RuntimeError(f"POST /api/tasks/batch answered {status}")
+        return -(-count // MAX_BATCH_SIZE)
+
+    result = {'tasks': count}
+    for name, fn in (('single_requests', single), ('batch', batch)):
+        with counted_sql(app, db) as counts:
+            started = time.perf_counter()
+            requests = fn()
+            elapsed = time.perf_counter() - started
+        result[name] = {'requests': requests, 'seconds': round(elapsed, 3),
+                        'tasks_per_s': round(count / elapsed, 1), **counts}
+    result['speedup'] = round(result['single_requests']['seconds'] / result['batch']['seconds'], 1)
+    return result
+
+
+def run_login_benchmark(app, password_hasher, emails, password, workers, duration, seed):
+    """Hammer POST /api/auth/login from ``workers`` threads while one more thread
+    polls GET /api/tasks/summary, first with bcrypt called inline on the request
+    thread (how login worked before the hasher pool) and then through
+    ``password_hasher``. Reports login and summary latency for both; a login
+    turned away with 503 counts as an error."""
+    from unittest import mock
+
+    reader = ApiWorker(TestClient(app), emails[0], password, random.Random(seed))
+    if not reader.login():
+        raise RuntimeError(f"Could not log in as {emails[0]}")
+
+    def run():
+        samples, errors = defaultdict(list), defaultdict(int)
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + duration
+
+        def timed(op, fn):
+            local, failed = [], 0
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                if fn():
+                    local.append(time.perf_counter() - started)
+                else:
+                    failed += 1
+            with lock:
+                samples[op].extend(local)
+                errors[op] += failed
+
+        def log_in(index):
+            worker = ApiWorker(TestClient(app), emails[index % len(emails)], password, random.Random(seed + index))
+            timed('login', worker.login)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+            futures = [pool.submit(log_in, i) for i in range(workers)]
+            futures.append(pool.submit(timed, 'summary', reader.summary))
+            for future in futures:
+                future.result()
+        return summarize(samples, errors, time.perf_counter() - started)
+
+    with mock.patch.object(password_hasher, 'check', password_hasher._check):
+        inline = run()
+    return {'workers': workers, 'inline': inline, 'pool': run()}
+
+
+def _open_database(database, profile):
+    # Runs in a fresh process: app.py reads its configuration at import time
+    os.environ['DATABASE_URL'] = database
+    os.environ['SQLITE_PROFILE'] = profile
+    os.environ['DEPLOYMENT_MODE'] = 'gunicorn'
+    # Cheap hashes: the seed and the workers' logins shouldn't eat the CPU being measured
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+    return app, db
+
+
+def _seed_process(database, profile, users, tasks_per_user, seed):
+    _open_database(database, profile)
+    from init_db import seed_db
+
+    with contextlib.redirect_stdout(sys.stderr):
+        return seed_db(users, tasks_per_user, seed)
+
+
+def _load_process(database, profile, emails, workers, duration, seed):
+    from sqlalchemy import event
+
+    app, db = _open_database(database, profile)
+    from init_db import SEED_PASSWORD
+
+    lock = threading.Lock()
+    locked = defaultdict(int)
+
+    def count_locks(context):
+        error = context.original_exception
+        if 'locked' in str(error):
+            # SQLITE_BUSY after the busy timeout ran out, SQLITE_BUSY_SNAPSHOT when
+            # a read transaction can't become a write one in WAL mode
+            with lock:
+                locked[getattr(error, 'sqlite_errorname', 'SQLITE_BUSY')] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'handle_error', count_locks)
+    result = run_api_workload(lambda: TestClient(app), emails, SEED_PASSWORD, parse_mix(PROFILE_MIX),
+                              workers, duration, seed)
+    result['lock_errors'] = dict(locked)
+    return result
+
+
+def run_profile_benchmark(profiles, processes, workers, duration, users, tasks_per_user, seed):
+    """Run the API mix from ``processes`` processes at once (as gunicorn workers
+    would), ``workers`` threads each, against one SQLite file per profile, and
+    report throughput and the rate of "database is locked" errors."""
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    result = {'processes': processes, 'workers_per_process': workers, 'mix': PROFILE_MIX}
+    for profile in profiles:
+        # A fresh file each time: journal_mode=WAL sticks to the file once set
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), f'{profile}.db')
+        with context.Pool(1) as pool:
+            user_ids = pool.apply(_seed_process, (database, profile, users, tasks_per_user, seed))
+        emails = [f'seed{user_id}@example.com' for user_id in user_ids]
+        with context.Pool(processes) as pool:
+            runs = pool.starmap(_load_process, [(database, profile, emails[i::processes] or emails, workers, duration, seed + i)
+                                                for i in range(processes)])
+        operations = sum(run['operations'] for run in runs)
+        errors = sum(entry['errors'] for run in runs for entry in run['ops'].values())
+        by_code = defaultdict(int)
+        for run in runs:
+            for code, count in run['lock_errors'].items():
+                by_code[code] += count
+        lock_errors = sum(by_code.values())
+        p99 = defaultdict(float)
+        for run in runs:
+            for op, entry in run['ops'].items():
+                p99[op] = max(p99[op], entry.get('p99_ms', 0.0))
+        result[profile] = {
+            'operations': operations,
+            'throughput_per_s': round(sum(run['throughput_per_s'] for run in runs), 1),
+            'errors': errors,
+            'lock_errors': lock_errors,
+            'lock_error_rate': round(lock_errors / (operations + errors), 4) if operations + errors else 0.0,
+            'lock_errors_by_code': dict(sorted(by_code.items())),
+            'worst_p99_ms': dict(sorted(p99.items())),
+        }
+    return result
+
+
+def run_search_benchmark(app, db, emails, password, users, repeat):
+    """Time each of SEARCH_QUERIES for ``users`` seed accounts three ways: the
+    FTS5 query behind GET /api/tasks/search, a LIKE query per word over the
+    user's rows (both as SQL only), and the client-side approach of
+    downloading GET /api/tasks and filtering it."""
+    from sqlalchemy import text
+    from search import SEARCH_CANDIDATES, SEARCH_SQL, search_params
+
+    like_sql = 'SELECT id FROM task WHERE user_id = :user_id AND {} ORDER BY created_at DESC LIMIT 20'
+    like_term = "(title LIKE :{0} OR description LIKE :{0} OR tags LIKE :{0})"
+    samples = defaultdict(list)
+    matches = {}
+    for email in emails[:users]:
+        worker = ApiWorker(TestClient(app), email, password, random.Random(0))
+        if not worker.login():
+            raise RuntimeError(f"Could not log in as {email}")
+        _, me = worker.client.request('GET', '/api/auth/me', headers=worker.headers)
+        for q in SEARCH_QUERIES:
+            words = q.split()
+            sql = text(like_sql.format(' AND '.join(like_term.format(f'w{i}') for i in range(len(words)))))
+            params = {'user_id': me['id'], **{f'w{i}': f'%{word}%' for i, word in enumerate(words)}}
+            for _ in range(repeat):
+                started = time.perf_counter()
+                with app.app_context():
+                    rows = db.session.execute(SEARCH_SQL, {**search_params(q, me['id']), 'limit': 20,
+                                                           'candidates': SEARCH_CANDIDATES}).all()
+                samples[f'fts:{q}'].append(time.perf_counter() - started)
+                matches[q] = len(rows)
+
+                started = time.perf_counter()
+                with app.app_context():
+                    db.session.execute(sql, params).all()
+                samples[f'like:{q}'].append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                _, tasks = worker.client.request('GET', '/api/tasks', headers=worker.headers)
+                found = [task for task in tasks
+                         if all(any(word in (task[field] or '').lower() for field in ('title', 'description', 'tags'))
+                                for word in words)]
+                samples[f'client:{q}'].append(time.perf_counter() - started)
+    with app.app_context():
+        total = db.session.query(db.func.count()).select_from(db.metadata.tables['task']).scalar()
+    result = summarize(samples, {}, 0)['ops']
+    for entry in result.values():
+        del entry['throughput_per_s']
+    return {'tasks_in_database': total, 'users': min(users, len(emails)), 'results_per_query': matches,
+            'ops': result}
+
+
+def run_parser_benchmark(count):
+    """Parse ``count`` chat messages with taskparser.parse_task and report the
+    time per message in microseconds (the target is well under 100 µs on a Pi)."""
+    from taskparser import parse_task
+
+    now = datetime(2026, 10, 14, 10, 0)
+    messages = [CHAT_MESSAGES[i % len(CHAT_MESSAGES)] for i in range(count)]
+    for message in CHAT_MESSAGES:
+        parse_task(message, now)  # warm up
+    samples = []
+    started = time.perf_counter()
+    for message in messages:
+        t = time.perf_counter()
+        parse_task(message, now)
+        samples.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        'messages': count,
+        'messages_per_s': round(count / elapsed, 1),
+        'mean_us': round(sum(samples) / count * 1e6, 2),
+        'p50_us': round(percentile(samples, 0.50) * 1e6, 2),
+        'p99_us': round(percentile(samples, 0.99) * 1e6, 2),
+        'max_us': round(samples[-1] * 1e6, 2),
+    }
+
+
+def rss_kb():
+    # Linux only; None elsewhere
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run_sse_benchmark(app, email, password, subscribers, idle_seconds):
+    """Hold ``subscribers`` idle /api/tasks/stream connections open against a
+    threaded server on a local port, and report memory and CPU per connection
+    while they idle. Then create one task and time its event reaching every
+    subscriber. Client sockets live in this process too, so the per-connection
+    figures include both ends."""
+    import selectors
+    import socket
+    from werkzeug.serving import make_server
+
+    worker = ApiWorker(TestClient(app), email, password, random.Random(0))
+    if not worker.login():
+        raise RuntimeError(f"Could not log in as {email}")
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    request = (f"GET /api/tasks/stream HTTP/1.1\r\nHost: localhost\r\n"
+               f"Authorization: {worker.headers['Authorization']}\r\n\r\n").encode('ascii')
+
+    base_rss, base_threads = rss_kb(), threading.active_count()
+    sockets = []
+    started = time.perf_counter()
+    try:
+        for _ in range(subscribers):
+            sock = socket.create_connection(('127.0.0.1', server.server_port))
+            sock.sendall(request)
+            received = b''
+            while b'retry:' not in received:
+                received += sock.recv(4096)
+            sockets.append(sock)
+        connect_seconds = time.perf_counter() - started
+        connected_rss = rss_kb()
+
+        cpu_started, idle_started = time.process_time(), time.perf_counter()
+        time.sleep(idle_seconds)
+        idle_cpu = time.process_time() - cpu_started
+        idle_elapsed = time.perf_counter() - idle_started
+
+        selector = selectors.DefaultSelector()
+        for sock in sockets:
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ, bytearray())
+        published = time.perf_counter()
+        worker.create()
+        latencies, pending = [], len(sockets)
+        while pending and time.perf_counter() - published < 30:
+            for key, _ in selector.select(timeout=1):
+                key.data.extend(key.fileobj.recv(65536))
+                if b'event: created' in key.data:
+                    latencies.append(time.perf_counter() - published)
+                    selector.unregister(key.fileobj)
+                    pending -= 1
+        latencies.sort()
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.shutdown()
+
+    result = {
+        'subscribers': len(sockets),
+        'connect_seconds': round(connect_seconds, 3),
+        'server_threads_added': threading.active_count() - base_threads,
+        'idle_seconds': round(idle_elapsed, 3),
+        'idle_cpu_ms_per_connection_per_min': round(idle_cpu / len(sockets) / idle_elapsed * 60 * 1000, 3),
+        'delivered': len(latencies),
+    }
+    if base_rss is not None:
+        result['rss_kb_per_connection'] = round((connected_rss - base_rss) / len(sockets), 1)
+    if latencies:
+        result['delivery_p50_ms'] = round(percentile(latencies, 0.50) * 1000, 3)
+        result['delivery_max_ms'] = round(latencies[-1] * 1000, 3)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database', help='SQLAlchemy URL (default: a fresh temporary SQLite file)')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--users', type=int, default=50, help='users to seed')
+    parser.add_argument('--tasks-per-user', type=int, default=200, help='tasks to seed per user')
+    parser.add_argument('--no-seed', action='store_true', help='use the seed users already in the database')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent API clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of API load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'operation weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--bot-updates', type=int, default=2000, help='Telegram updates to replay (0 to skip)')
+    parser.add_argument('--bot-users', type=int, default=20, help='seed users linked to Telegram for the replay')
+    parser.add_argument('--bot-mode', choices=('direct', 'polling', 'webhook'), default='direct',
+                        help='how replayed updates reach the bot (default: direct)')
+    parser.add_argument('--batch-tasks', type=int, default=0,
+                        help='also create this many tasks one request each and in batch calls (e.g. 1000)')
+    parser.add_argument('--login-workers', type=int, default=0,
+                        help='also compare login latency with inline bcrypt vs the hasher pool (e.g. 16)')
+    parser.add_argument('--profile-processes', type=int, default=0,
+                        help='also run the API mix from this many processes against the default and tuned '
+                             'SQLite profiles (e.g. 4)')
+    parser.add_argument('--search-users', type=int, default=0,
+                        help='also time FTS search vs LIKE vs client-side filtering for this many seed users')
+    parser.add_argument('--parse-messages', type=int, default=0,
+                        help='also time the chat message parser over this many messages (e.g. 100000)')
+    parser.add_argument('--sse-subscribers', type=int, default=0,
+                        help='also hold this many idle /api/tasks/stream connections (e.g. 300)')
+    parser.add_argument('--sse-idle-seconds', type=float, default=20.0,
+                        help='how long the SSE subscribers idle before one event is published')
+    parser.add_argument('--serialize-tasks', type=int, default=0,
+                        help='also time serializing this many tasks, old path vs fast path (e.g. 10000)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    parser.add_argument('-o', '--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    # app.py reads its configuration at import time
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    elif not args.url:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-jwt-secret-key-0123456789')
+    os.environ['TELEGRAM_BOT_TOKEN'] = '123456:benchmark'
+    os.environ.setdefault('TELEGRAM_WEBHOOK_SECRET', 'benchmark')
+    # Measure the app, not the rate limiter turning the load into 429s
+    for limit in ('AUTH', 'AUTH_IP', 'READ', 'WRITE'):
+        os.environ.setdefault(f'RATE_LIMIT_{limit}', '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from app import app, db, User, Task, TaskCounter, password_hasher
+    from init_db import SEED_PASSWORD, seed_db
+
+    report = {
+        'revision': git_revision(),
+        'started_at': datetime.utcnow().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'environment': {
+            'python': sys.version.split()[0],
+            'sqlite_profile': app.config['SQLITE_PROFILE'],
+            'bcrypt_rounds': app.config['BCRYPT_LOG_ROUNDS'],
+        },
+    }
+
+    if args.no_seed:
+        with app.app_context():
+            user_ids = [row.id for row in User.query.filter(User.email.like('seed%@example.com'))
+                        .with_entities(User.id).order_by(User.id)]
+    else:
+        started = time.perf_counter()
+        # Progress goes to stderr so stdout stays a clean JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            user_ids = seed_db(args.users, args.tasks_per_user, args.seed)
+        report['seed'] = {'users': len(user_ids), 'tasks': len(user_ids) * args.tasks_per_user,
+                          'seconds': round(time.perf_counter() - started, 3)}
+    if not user_ids:
+        parser.error('no seed users found; run without --no-seed or seed with init_db.py --seed')
+    emails = [f'seed{user_id}@example.com' for user_id in user_ids]
+
+    if args.duration > 0:
+        make_client = (lambda: HttpClient(args.url)) if args.url else (lambda: TestClient(app))
+        report['api'] = run_api_workload(make_client, emails, SEED_PASSWORD, parse_mix(args.mix),
+                                         args.workers, args.duration, args.seed)
+
+    if args.batch_tasks > 0:
+        report['batch'] = run_batch_benchmark(app, db, emails[0], SEED_PASSWORD, args.batch_tasks, args.seed)
+
+    if args.profile_processes > 0:
+        report['sqlite_profiles'] = run_profile_benchmark(
+            ('default', 'tuned'), args.profile_processes, args.workers, args.duration or 10.0,
+            args.users, args.tasks_per_user, args.seed)
+
+    if args.search_users > 0:
+        report['search'] = run_search_benchmark(app, db, emails, SEED_PASSWORD, args.search_users, repeat=5)
+
+    if args.parse_messages > 0:
+        report['parser'] = run_parser_benchmark(args.parse_messages)
+
+    if args.login_workers > 0:
+        report['login'] = run_login_benchmark(app, password_hasher, emails, SEED_PASSWORD, args.login_workers,
+                                              args.duration or 10.0, args.seed)
+
+    if args.sse_subscribers > 0:
+        report['sse'] = run_sse_benchmark(app, emails[0], SEED_PASSWORD, args.sse_subscribers,
+                                          args.sse_idle_seconds)
+
+    if args.bot_updates > 0:
+        from bot import TaskBot
+
+        linked = user_ids[:args.bot_users]
+        telegram_ids = [10 ** 9 + user_id for user_id in linked]
+        with app.app_context():
+            users = User.__table__
+            db.session.execute(
+                users.update().where(users.c.id == db.bindparam('u_id')).values(telegram_id=db.bindparam('t_id')),
+                [{'u_id': user_id, 't_id': telegram_id} for user_id, telegram_id in zip(linked, telegram_ids)])
+            db.session.commit()
+        bot = TaskBot(app, db, User, Task, password_hasher, TaskCounter, request=make_bench_request())
+        concurrency = int(os.getenv('BOT_CONCURRENT_UPDATES', 8))
+        report['bot'] = asyncio.run(
+            replay_bot_updates(bot, telegram_ids, args.bot_updates, concurrency, args.seed,
+                               mode=args.bot_mode, flask_app=app))
+        bot.db_executor.shutdown(wait=True)
+
+    if args.serialize_tasks > 0:
+        with contextlib.redirect_stdout(sys.stderr):
+            serialize_user = seed_db(1, args.serialize_tasks, args.seed)[0]
+        report['serialization'] = run_serialization_benchmark(app, db, Task, serialize_user)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,57 @@
+import asyncio
+import html
+import math
 import os
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from events import broker
+from hashing import HasherBusy
+from ingest import GroupCommitQueue
+from cache import MISSING, TTLCache, telegram_users
+from metrics import timed_handler
+from taskparser import parse_task
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import (Application, ApplicationHandlerStop, CallbackQueryHandler, CommandHandler,
+                          MessageHandler, TypeHandler, filters, ContextTypes)
 
 app = None
 db = None  
 User = None
 Task = None
+TaskCounter = None
+password_hasher = None
+
+TASKS_PAGE_SIZE = 10
+EPOCH = datetime(1970, 1, 1)
+MAX_MESSAGE_LENGTH = 4096
+# Escaped lengths per /tasks entry. With the fixed text around them an entry
+# stays under 390 characters, so a page of TASKS_PAGE_SIZE fits in one message
+PRIORITY_BUDGET = 10
+TITLE_BUDGET = 110
+DESCRIPTION_BUDGET = 210
+
+
+def clip_escaped(text, budget):
+    """HTML-escape ``text`` for a message, cut between characters so the
+    escaped result (with a trailing '…' when cut) is at most ``budget`` long.
+    Never splits an entity the way slicing the escaped string would."""
+    escaped = html.escape(text)
+    if len(escaped) <= budget:
+        return escaped
+    pieces, used = [], 0
+    for char in text:
+        piece = html.escape(char)
+        if used + len(piece) > budget - 1:
+            break
+        pieces.append(piece)
+        used += len(piece)
+    return ''.join(pieces) + '…'
+
 
 class TaskBot:
-    def __init__(self, flask_app=None, database=None, user_model=None, task_model=None):
-        global app, db, User, Task
+    def __init__(self, flask_app=None, database=None, user_model=None, task_model=None, hasher=None,
+                 counter_model=None, request=None, rate_limiter=None):
+        global app, db, User, Task, password_hasher, TaskCounter
         
         if flask_app:
             app = flask_app
@@ -19,12 +61,43 @@ class TaskBot:
             User = user_model
         if task_model:
             Task = task_model
+        if hasher:
+            password_hasher = hasher
+        if counter_model:
+            TaskCounter = counter_model
             
         self.token = os.getenv('TELEGRAM_BOT_TOKEN')
         if not self.token:
             raise ValueError("TELEGRAM_BOT_TOKEN not found")
+
+        # SQLite allows one writer at a time, so a few threads are plenty; they
+        # keep queries off the event loop so one slow write doesn't stall other chats
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('BOT_DB_WORKERS', 4)), thread_name_prefix='bot-db')
+        # Tasks created from chat are group-committed: one fsync per batch, not per message
+        self.task_queue = GroupCommitQueue(
+            lambda rows: self.run_db(self._create_tasks, rows),
+            max_batch=int(os.getenv('BOT_BATCH_MAX_SIZE', 50)),
+            max_delay=int(os.getenv('BOT_BATCH_MAX_DELAY_MS', 5)) / 1000,
+        )
+        
+        # Per-user token buckets; chats over the limit get one notice, then silence
+        self.rate_limiter = rate_limiter
+        self.throttle_notices = TTLCache(maxsize=1024, ttl=60.0)
+
+        # Rendered /tasks pages per user, dropped whenever one of their tasks changes
+        self.page_cache = TTLCache(maxsize=1024, ttl=300.0)
+        broker.add_listener(lambda event: self.page_cache.invalidate(event[1]))
         
-        self.application = Application.builder().token(self.token).build()
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .concurrent_updates(int(os.getenv('BOT_CONCURRENT_UPDATES', 8)))
+        )
+        if request is not None:
+            # Custom transport for Bot API calls (the benchmark answers them locally)
+            builder = builder.request(request)
+        self.application = builder.build()
         self.setup_handlers()
         self.initialized = False
     
@@ -33,14 +106,36 @@ class TaskBot:
             await self.application.initialize()
             self.initialized = True
     
+    async def process_update_data(self, data):
+        # Webhook mode: the dispatcher hands over raw update JSON
+        await self.application.process_update(Update.de_json(data, self.application.bot))
+    
     def setup_handlers(self):
-        self.application.add_handler(CommandHandler("start", self.start))
-        self.application.add_handler(CommandHandler("link", self.link_account))
-        self.application.add_handler(CommandHandler("new", self.add_task))
-        self.application.add_handler(CommandHandler("tasks", self.list_tasks))
-        self.application.add_handler(CommandHandler("help", self.help_command))
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(TypeHandler(Update, self.throttle), group=-1)
+        self.application.add_handler(CommandHandler("start", timed_handler("start", self.start)))
+        self.application.add_handler(CommandHandler("link", timed_handler("link", self.link_account)))
+        self.application.add_handler(CommandHandler("new", timed_handler("new", self.add_task)))
+        self.application.add_handler(CommandHandler("tasks", timed_handler("tasks", self.list_tasks)))
+        self.application.add_handler(CallbackQueryHandler(timed_handler("tasks_page", self.page_tasks), pattern=r'^tasks:'))
+        self.application.add_handler(CommandHandler("help", timed_handler("help", self.help_command)))
+        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, timed_handler("message", self.handle_message)))
     
+    async def throttle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if self.rate_limiter is None or user is None:
+            return
+        retry_after = self.rate_limiter.check('bot', user.id)
+        if not retry_after:
+            return
+        text = f"You're sending messages too fast, please wait {math.ceil(retry_after)} s."
+        if update.callback_query:
+            await update.callback_query.answer(text)
+        elif self.throttle_notices.get(user.id) is MISSING and update.effective_message:
+            self.throttle_notices.set(user.id, True)
+            await update.effective_message.reply_text(text)
+        # Skip the command and message handlers for this update
+        raise ApplicationHandlerStop
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             "Hi! I'm your task manager bot.\n\n"
@@ -49,6 +144,143 @@ class TaskBot:
             "Type /help for more commands."
         )
     
+    async def run_db(self, fn, *args):
+        # Each call runs on the DB pool inside its own app context, so it gets
+        # its own scoped session that is removed when the context ends
+        def call():
+            with app.app_context():
+                return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.db_executor, call)
+
+    @staticmethod
+    def _find_user(telegram_id):
+        row = db.session.query(User.id, User.is_active).filter_by(telegram_id=telegram_id).first()
+        return (row.id, row.is_active) if row else None
+
+    @staticmethod
+    def _find_credentials(email):
+        return db.session.query(User.id, User.password_hash).filter_by(email=email).first()
+
+    @staticmethod
+    def _link_telegram(user_id, telegram_id):
+        previous = db.session.query(User.telegram_id).filter_by(id=user_id).scalar()
+        User.query.filter_by(id=user_id).update({User.telegram_id: telegram_id})
+        db.session.commit()
+        # Bulk updates skip the User mapper events, so invalidate here
+        telegram_users.invalidate(telegram_id)
+        if previous is not None:
+            telegram_users.invalidate(previous)
+
+    async def find_user_id(self, telegram_id):
+        user = telegram_users.get(telegram_id)
+        if user is MISSING:
+            user = await self.run_db(self._find_user, telegram_id)
+            telegram_users.set(telegram_id, user)
+        if user is None or not user[1]:
+            return None
+        return user[0]
+
+    @staticmethod
+    def _create_tasks(rows):
+        created = Task.insert_many(rows)
+        for user_id in {row['user_id'] for row in rows}:
+            user_tasks = [task for task in created if task.user_id == user_id]
+            Task.sync_tags(user_id, [(task.id, None, task.tags) for task in user_tasks])
+            TaskCounter.apply(user_id, after=user_tasks)
+            Task.log_changes(user_id, [task.id for task in user_tasks], 'upsert')
+            User.bump_tasks_version(user_id)
+        # Serialize before commit so expired instances aren't reloaded one by one
+        tasks_data = [task.to_dict() for task in created]
+        db.session.commit()
+        for task_data in tasks_data:
+            broker.publish(task_data['user_id'], 'created', task_data)
+        return tasks_data
+
+    async def create_task(self, user_id, parsed):
+        return await self.task_queue.submit(parsed.to_row(user_id))
+
+    @staticmethod
+    def describe(parsed):
+        details = [f"priority: {parsed.priority}"]
+        if parsed.due_date:
+            details.append(f"due: {parsed.due_date.strftime('%Y-%m-%d %H:%M')}")
+        if parsed.tags:
+            details.append("tags: " + ', '.join(f'#{tag}' for tag in parsed.tags))
+        if parsed.status != 'todo':
+            details.append(f"status: {parsed.status}")
+        return f"Task added: {parsed.title} ({'; '.join(details)})"
+
+    @staticmethod
+    def _pending_page(user_id, direction, position, limit):
+        # Keyset paging over (created_at, id), which the (user_id, completed,
+        # created_at) index already orders; "prev" walks backwards from position
+        query = db.session.query(Task.id, Task.created_at, Task.title, Task.description,
+                                 Task.priority, Task.due_date) \
+            .filter_by(user_id=user_id, completed=False)
+        if position is not None:
+            created_at, task_id = position
+            if direction == 'next':
+                query = query.filter(db.or_(Task.created_at > created_at,
+                                            db.and_(Task.created_at == created_at, Task.id > task_id)))
+            else:
+                query = query.filter(db.or_(Task.created_at < created_at,
+                                            db.and_(Task.created_at == created_at, Task.id < task_id)))
+        if direction == 'prev':
+            rows = query.order_by(Task.created_at.desc(), Task.id.desc()).limit(limit + 1).all()
+            more = len(rows) > limit
+            return list(reversed(rows[:limit])), more
+        rows = query.order_by(Task.created_at, Task.id).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def encode_position(task):
+        return f"{(task.created_at - EPOCH) // timedelta(microseconds=1)}:{task.id}"
+
+    @staticmethod
+    def decode_position(value):
+        micros, task_id = value.split(':')
+        return EPOCH + timedelta(microseconds=int(micros)), int(task_id)
+
+    @staticmethod
+    def render_page(tasks, page, has_prev, has_next):
+        parts = [f"Your tasks (page {page}):"]
+        for i, task in enumerate(tasks, (page - 1) * TASKS_PAGE_SIZE + 1):
+            lines = [f"{i}. [{clip_escaped(task.priority.upper(), PRIORITY_BUDGET)}] "
+                     f"<b>{clip_escaped(task.title, TITLE_BUDGET)}</b>"]
+            if task.description:
+                lines.append(f"   📝 {clip_escaped(task.description, DESCRIPTION_BUDGET)}")
+            if task.due_date:
+                lines.append(f"   📅 Due: {task.due_date.strftime('%Y-%m-%d')}")
+            parts.append('\n'.join(lines))
+        text = '\n\n'.join(parts)
+
+        buttons = []
+        if has_prev:
+            buttons.append(InlineKeyboardButton(
+                "« Prev", callback_data=f"tasks:prev:{page - 1}:{TaskBot.encode_position(tasks[0])}"))
+        if has_next:
+            buttons.append(InlineKeyboardButton(
+                "Next »", callback_data=f"tasks:next:{page + 1}:{TaskBot.encode_position(tasks[-1])}"))
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def tasks_page(self, user_id, direction='next', page=1, position=None):
+        key = f"{direction}:{page}:{position}"
+        pages = self.page_cache.get(user_id)
+        if pages is MISSING:
+            pages = {}
+            self.page_cache.set(user_id, pages)
+        if key not in pages:
+            tasks, more = await self.run_db(
+                self._pending_page, user_id, direction,
+                self.decode_position(position) if position else None, TASKS_PAGE_SIZE)
+            if not tasks:
+                pages[key] = None
+            elif direction == 'next':
+                pages[key] = self.render_page(tasks, page, page > 1, more)
+            else:
+                pages[key] = self.render_page(tasks, page, more, True)
+        return pages[key]
+
     async def link_account(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if len(context.args) != 2:
             await update.message.reply_text("Usage: /link email password")
@@ -57,14 +289,19 @@ class TaskBot:
         email, password = context.args
         telegram_id = update.effective_user.id
         
-        with app.app_context():
-            user = User.query.filter_by(email=email).first()
-            if user and user.check_password(password):
-                user.telegram_id = telegram_id
-                db.session.commit()
-                await update.message.reply_text("Account linked! You can now add tasks.")
-            else:
-                await update.message.reply_text("Invalid email or password.")
+        credentials = await self.run_db(self._find_credentials, email)
+        try:
+            valid = bool(credentials) and await asyncio.wrap_future(
+                password_hasher.check_async(credentials.password_hash, password))
+        except HasherBusy:
+            await update.message.reply_text("I'm busy right now, please try again in a moment.")
+            return
+
+        if valid:
+            await self.run_db(self._link_telegram, credentials.id, telegram_id)
+            await update.message.reply_text("Account linked! You can now add tasks.")
+        else:
+            await update.message.reply_text("Invalid email or password.")
     
     async def add_task(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         telegram_id = update.effective_user.id
@@ -73,59 +310,56 @@ class TaskBot:
             await update.message.reply_text("Usage: /new Your task description")
             return
         
-        task_text = ' '.join(context.args)
-        priority = "medium"
+        parsed = parse_task(' '.join(context.args))
         
-        if any(word in task_text.lower() for word in ['urgent', 'important']):
-            priority = "high"
-        elif any(word in task_text.lower() for word in ['later', 'someday', 'maybe']):
-            priority = "low"
+        user_id = await self.find_user_id(telegram_id)
+        if not user_id:
+            await update.message.reply_text("Please link your account first: /link email password")
+            return
         
-        with app.app_context():
-            user = User.query.filter_by(telegram_id=telegram_id).first()
-            if not user:
-                await update.message.reply_text("Please link your account first: /link email password")
-                return
-            
-            task = Task(
-                title=task_text,
-                user_id=user.id,
-                priority=priority
-            )
-            db.session.add(task)
-            db.session.commit()
-            
-            await update.message.reply_text(f"Task added: {task_text} (priority: {priority})")
+        await self.create_task(user_id, parsed)
+        await update.message.reply_text(self.describe(parsed))
     
     async def list_tasks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         telegram_id = update.effective_user.id
         
-        with app.app_context():
-            user = User.query.filter_by(telegram_id=telegram_id).first()
-            if not user:
-                await update.message.reply_text("Please link your account first: /link email password")
-                return
-            
-            tasks = Task.query.filter_by(user_id=user.id, completed=False).limit(100).all()
-            
-            if not tasks:
-                await update.message.reply_text("No pending tasks!")
-                return
-            
-            message = "Your tasks:\n\n"
-            for i, task in enumerate(tasks, 1):
-                priority_text = f"[{task.priority.upper()}]"
-                
-                task_line = f"{i}. {priority_text} <b>{task.title}</b>"
-                if task.description:
-                    task_line += f"\n   📝 {task.description}"
-                
-                if task.due_date:
-                    task_line += f"\n   📅 Due: {task.due_date.strftime('%Y-%m-%d')}"
-                
-                message += task_line + "\n\n"
-            
-            await update.message.reply_text(message, parse_mode='HTML')
+        user_id = await self.find_user_id(telegram_id)
+        if not user_id:
+            await update.message.reply_text("Please link your account first: /link email password")
+            return
+        
+        page = await self.tasks_page(user_id)
+        if not page:
+            await update.message.reply_text("No pending tasks!")
+            return
+        
+        text, markup = page
+        await update.message.reply_text(text, parse_mode='HTML', reply_markup=markup)
+
+    async def page_tasks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+
+        user_id = await self.find_user_id(query.from_user.id)
+        if not user_id:
+            return
+        try:
+            _, direction, page, position = query.data.split(':', 3)
+            page = int(page)
+            # Checked here, not when the page is loaded: the data comes from the
+            # client and may be malformed or from an older bot version
+            self.decode_position(position)
+        except (ValueError, OverflowError):
+            return
+        if direction not in ('next', 'prev'):
+            return
+
+        page = await self.tasks_page(user_id, direction, page, position)
+        if not page:
+            await query.edit_message_text("No pending tasks!")
+            return
+        text, markup = page
+        await query.edit_message_text(text, parse_mode='HTML', reply_markup=markup)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         help_text = """
@@ -139,6 +373,9 @@ Commands:
 Tips:
 - Use words like 'urgent' or 'important' for high priority
 - Use words like 'later' or 'maybe' for low priority
+- Add a deadline: 'tomorrow 5pm', 'next friday', 'in 3 days', '2025-10-03 at 14:00'
+- Add tags with #hashtags
+- Say 'in progress' or 'already done' to set the status
         """
         await update.message.reply_text(help_text)
     
@@ -146,30 +383,14 @@ Tips:
         text = update.message.text
         telegram_id = update.effective_user.id
         
-        with app.app_context():
-            user = User.query.filter_by(telegram_id=telegram_id).first()
-            if not user:
-                await update.message.reply_text("Link your account first: /link email password")
-                return
+        user_id = await self.find_user_id(telegram_id)
+        if not user_id:
+            await update.message.reply_text("Link your account first: /link email password")
+            return
         
         if len(text) > 3 and not text.startswith('/'):
-            if any(word in text.lower() for word in ['urgent', 'important']):
-                priority = "high"
-            elif any(word in text.lower() for word in ['later', 'someday', 'maybe']):
-                priority = "low"
-            else:
-                priority="medium"
-
-            task = Task(
-                title=text,
-                user_id=user.id,
-                priority=priority
-            )
-            
-            with app.app_context():
-                db.session.add(task)
-                db.session.commit()
-            
-            await update.message.reply_text(f"Task added: {text} (priority: {priority})")
+            parsed = parse_task(text)
+            await self.create_task(user_id, parsed)
+            await update.message.reply_text(self.describe(parsed))
         else:
             await update.message.reply_text("Type /help for commands")
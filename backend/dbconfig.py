@@ -0,0 +1,77 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# PRAGMAs applied to every new SQLite connection. "default" leaves SQLite's
+# rollback journal and settings untouched; "tuned" lets readers run alongside
+# the single writer (WAL) and waits on locks instead of failing immediately.
+SQLITE_PROFILES = {
+    'default': {},
+    'tuned': {
+        # Only takes effect on a new database file (or after one full VACUUM,
+        # see init_db.py --vacuum), and only if set before journal_mode
+        # writes the header; lets freed pages be returned in small steps
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 128 * 1024 * 1024,
+        'cache_size': -16000,  # negative means KiB, so ~16 MB
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Connection pool per deployment mode. "single" is app.py's own process with the
+# Flask threads and the bot sharing one pool; "gunicorn" is one pool per worker.
+POOL_PROFILES = {
+    'single': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30},
+    'gunicorn': {'pool_size': 2, 'max_overflow': 2, 'pool_timeout': 30},
+}
+
+_active_pragmas = {}
+
+
+def is_memory_database(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+
+def configure_sqlite(app, profile='tuned', deployment='single', overrides=None):
+    """Set SQLALCHEMY_ENGINE_OPTIONS and the PRAGMAs for a SQLite database URI.
+
+    Must run before the SQLAlchemy extension is initialised. Non-SQLite URIs
+    are left alone.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if not uri.startswith('sqlite'):
+        return
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{profile}'")
+    if deployment not in POOL_PROFILES:
+        raise ValueError(f"Unknown deployment mode '{deployment}'")
+
+    pragmas = dict(SQLITE_PROFILES[profile])
+    # Overrides are the numeric PRAGMAs, usually read straight from the environment
+    pragmas.update({k: int(v) for k, v in (overrides or {}).items() if v not in (None, '')})
+    _active_pragmas.clear()
+    _active_pragmas.update(pragmas)
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    if not is_memory_database(uri):
+        options.update(POOL_PROFILES[deployment])
+    if 'busy_timeout' in pragmas:
+        # pysqlite's own lock wait, which also covers BEGIN before the PRAGMA runs
+        options.setdefault('connect_args', {})['timeout'] = pragmas['busy_timeout'] / 1000
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not _active_pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _active_pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
@@ -0,0 +1,100 @@
+import json
+import queue
+import threading
+from collections import deque
+
+
+class Subscription:
+    def __init__(self, user_id, max_queue):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Set when the client falls too far behind; it must reconnect and resume
+        self.overflowed = False
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class TaskEventBroker:
+    """In-process pub/sub for task changes, shared by the Flask routes and the bot.
+
+    Every published event gets a global, increasing id and is kept in a small
+    ring buffer so reconnecting clients can resume from ``Last-Event-ID``.
+    """
+
+    def __init__(self, replay_size=256, max_queue=64):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = {}
+        self._listeners = []
+
+    def publish(self, user_id, event_type, data):
+        with self._lock:
+            self._last_id += 1
+            event = (self._last_id, user_id, event_type, data)
+            self._replay.append(event)
+            subscribers = list(self._subscribers.get(user_id, ()))
+
+        for listener in self._listeners:
+            listener(event)
+
+        for sub in subscribers:
+            if sub.overflowed:
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                sub.overflowed = True
+        return event[0]
+
+    def add_listener(self, callback):
+        """Call ``callback(event)`` for every event of every user.
+
+        Callbacks run on the publishing thread and must not block.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Register a subscriber and return it with the events it missed.
+
+        The second value is ``None`` when ``last_event_id`` is older than the
+        replay buffer, meaning the client has to re-fetch its task list.
+        """
+        sub = Subscription(user_id, self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+            missed = []
+            if last_event_id is not None:
+                oldest = self._replay[0][0] if self._replay else self._last_id + 1
+                # Ids beyond the last one mean the process restarted since the client connected
+                if last_event_id + 1 < oldest or last_event_id > self._last_id:
+                    missed = None
+                else:
+                    missed = [e for e in self._replay if e[0] > last_event_id and e[1] == user_id]
+        return sub, missed
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+def format_sse(event):
+    event_id, _, event_type, data = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+broker = TaskEventBroker()
@@ -0,0 +1,41 @@
+"""Flask JSON provider that encodes with orjson when it is installed.
+
+Without orjson it behaves like Flask's default provider, except that dates
+and datetimes are written as ISO 8601 with either backend. That lets read
+paths hand datetime columns straight to ``jsonify`` instead of calling
+``isoformat()`` per value.
+"""
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def _orjson_options(self):
+        return orjson.OPT_SORT_KEYS if self.sort_keys else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        # Pretty-printed output (debug mode) keeps the stdlib encoder
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small worker pool so hashing never blocks request threads
+    or the bot's event loop for longer than the admission timeout.
+
+    ``max_pending`` caps hashes that are queued or running; callers beyond that
+    get ``HasherBusy`` instead of piling up behind a burst of logins.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=16, admission_timeout=2.0):
+        self.rounds = rounds
+        self.admission_timeout = admission_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, blocking, fn, *args):
+        if blocking:
+            admitted = self._slots.acquire(timeout=self.admission_timeout)
+        else:
+            admitted = self._slots.acquire(blocking=False)
+        if not admitted:
+            raise HasherBusy('Too many password operations in progress')
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    @staticmethod
+    def _check(pw_hash, password):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+        except ValueError:
+            return False
+
+    def hash(self, password):
+        return self._submit(True, self._hash, password).result()
+
+    def check(self, pw_hash, password):
+        return self._submit(True, self._check, pw_hash, password).result()
+
+    # Non-blocking variants for asyncio callers: admission never waits and the
+    # returned concurrent future can be awaited with asyncio.wrap_future.
+    def hash_async(self, password):
+        return self._submit(False, self._hash, password)
+
+    def check_async(self, pw_hash, password):
+        return self._submit(False, self._check, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        # bcrypt hashes look like $2b$12$<salt+digest>; the middle field is the cost
+        try:
+            return int(pw_hash.split('$')[2]) < self.rounds
+        except (IndexError, ValueError):
+            return True
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+
+class GroupCommitQueue:
+    """Write-behind queue that coalesces rows into one commit.
+
+    Rows are collected until ``max_batch`` is reached or ``max_delay`` seconds
+    pass since the first pending row, then ``write`` is awaited once with the
+    whole batch. ``submit`` resolves only after that write has committed, with
+    the value ``write`` returned for the row.
+    """
+
+    def __init__(self, write, max_batch=50, max_delay=0.005):
+        self.write = write
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._commit_lock = asyncio.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.commit_seconds = 0.0
+        self.max_commit_seconds = 0.0
+
+    async def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._take_and_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._take_and_flush)
+        return await future
+
+    def _take_and_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._flush(batch))
+
+    async def _flush(self, batch):
+        # Serialize group commits; SQLite has a single writer anyway
+        async with self._commit_lock:
+            started = time.perf_counter()
+            try:
+                results = await self.write([row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            elapsed = time.perf_counter() - started
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.commit_seconds += elapsed
+        self.max_commit_seconds = max(self.max_commit_seconds, elapsed)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def drain(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            await self._flush(batch)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'largest_batch': self.largest_batch,
+            'avg_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'avg_commit_seconds': self.commit_seconds / self.batches if self.batches else 0.0,
+            'max_commit_seconds': self.max_commit_seconds,
+        }
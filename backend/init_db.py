@@ -1,13 +1,30 @@
 #!/usr/bin/env python3
 
-from app import app, db, User, Task
+from app import app, db, User, Task, TaskChange, TaskCounter, password_hasher, task_archiver
+from search import create_search_index, drop_search_index
+from flask_migrate import stamp
 from datetime import datetime, timedelta
+import json
+import os
+import random
 import sys
+import time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def create_schema():
+    print("Creating tables...")
+    fresh = not db.inspect(db.engine).has_table('user')
+    db.create_all()
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+    if fresh:
+        # create_all already built the latest schema, so mark every migration as applied
+        stamp(directory=MIGRATIONS_DIR)
 
 def init_db():
     with app.app_context():
-        print("Creating tables...")
-        db.create_all()
+        create_schema()
         
         if User.query.first():
             print("Database already has data, skipping.")
@@ -48,14 +65,132 @@ def init_db():
         
         for task in tasks:
             db.session.add(task)
+        db.session.flush()
         
+        for task in tasks:
+            Task.log_changes(task.user_id, [task.id], 'upsert')
+        TaskCounter.rebuild()
         db.session.commit()
         print(f"Added {len(tasks)} tasks")
         print("Done!")
 
+SEED_PASSWORD = "benchpass123"
+SEED_WORDS = ["report", "meeting", "review", "deploy", "groceries", "invoice", "essay", "backup",
+              "dentist", "slides", "budget", "email", "refactor", "tests", "release", "plan"]
+SEED_TAGS = ["work", "home", "uni", "urgent", "errands", "health", "finance", "side-project"]
+
+def seed_db(users=100, tasks_per_user=100, seed=42):
+    """Bulk-load ``users`` accounts (seed<N>@example.com, password SEED_PASSWORD)
+    with ``tasks_per_user`` random tasks each. Passwords are hashed once and
+    rows go in with executemany inserts, so large databases load in seconds."""
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with app.app_context():
+        create_schema()
+        password_hash = password_hasher.hash(SEED_PASSWORD)
+        first = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        now = datetime.utcnow()
+        db.session.execute(db.insert(User), [
+            {'name': f'Seed User {i}', 'email': f'seed{i}@example.com', 'password_hash': password_hash,
+             'created_at': now, 'is_active': True, 'tasks_version': 0}
+            for i in range(first, first + users)])
+        user_ids = [row.id for row in db.session.query(User.id).filter(User.id >= first).order_by(User.id)]
+
+        for user_id in user_ids:
+            rows = []
+            for _ in range(tasks_per_user):
+                completed = rng.random() < 0.3
+                created_at = now - timedelta(days=rng.uniform(0, 180))
+                due_date = created_at + timedelta(days=rng.uniform(1, 60)) if rng.random() < 0.6 else None
+                tags = rng.sample(SEED_TAGS, rng.randint(0, 3))
+                rows.append({
+                    'title': ' '.join(rng.sample(SEED_WORDS, rng.randint(2, 5))).capitalize(),
+                    'description': ' '.join(rng.choices(SEED_WORDS, k=rng.randint(0, 20))) or None,
+                    'completed': completed, 'priority': rng.choice(['low', 'medium', 'medium', 'high']),
+                    'status': 'done' if completed else rng.choice(['todo', 'todo', 'inprogress']),
+                    'created_at': created_at, 'updated_at': created_at, 'due_date': due_date,
+                    'user_id': user_id, 'tags': json.dumps(tags),
+                })
+            # Plain executemany; ordered RETURNING would make SQLite insert row by row.
+            # The user is brand new, so their task ids in id order are exactly these rows.
+            db.session.execute(Task.__table__.insert(), rows)
+            task_ids = db.session.execute(
+                db.select(Task.id).filter(Task.user_id == user_id).order_by(Task.id)).scalars().all()
+            Task.sync_tags(user_id, [(task_id, None, row['tags']) for task_id, row in zip(task_ids, rows)])
+            Task.log_changes(user_id, task_ids, 'upsert')
+            if user_id % 50 == 0:
+                db.session.commit()
+
+        TaskCounter.rebuild()
+        db.session.commit()
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {len(user_ids)} users and {len(user_ids) * tasks_per_user} tasks in {elapsed:.1f}s")
+    return user_ids
+
+def compact_changes():
+    with app.app_context():
+        print("Compacting task change log...")
+        superseded, tombstones = TaskChange.compact()
+        db.session.commit()
+        print(f"Removed {superseded} superseded entries and {tombstones} tombstones")
+
+def archive_tasks():
+    if not app.config['ARCHIVE_AFTER_DAYS']:
+        print("Archiving is disabled (ARCHIVE_AFTER_DAYS=0)")
+        return
+    print(f"Archiving tasks completed more than {task_archiver.age.days} days ago...")
+    moved = task_archiver.run_once()
+    print(f"Archived {moved} tasks")
+
+VACUUM_STEP_PAGES = 2000
+
+def vacuum_db():
+    with app.app_context():
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            def pragma(sql):
+                # Read every row: incremental_vacuum frees pages as it is stepped
+                result = connection.exec_driver_sql(f'PRAGMA {sql}')
+                return result.fetchall() if result.returns_rows else []
+
+            if pragma('auto_vacuum')[0][0] != 2:
+                # Databases created before incremental auto-vacuum need one full
+                # VACUUM to switch it on; it rewrites the file and locks it meanwhile
+                print("Enabling incremental auto-vacuum (one-time full VACUUM)...")
+                pragma('auto_vacuum=INCREMENTAL')
+                connection.exec_driver_sql('VACUUM')
+            free_pages = pragma('freelist_count')[0][0]
+            freed = free_pages
+            while free_pages:
+                # Small steps keep each write lock short
+                pragma(f'incremental_vacuum({VACUUM_STEP_PAGES})')
+                time.sleep(0.05)
+                remaining = pragma('freelist_count')[0][0]
+                if remaining >= free_pages:
+                    break
+                free_pages = remaining
+            freed -= free_pages
+            page_size = pragma('page_size')[0][0]
+            print(f"Returned {freed} free pages ({freed * page_size / 1024 / 1024:.1f} MB) to the filesystem")
+            print("Updating query planner statistics...")
+            # Sampled ANALYZE: fast on big tables and good enough for the planner
+            pragma('analysis_limit=1000')
+            connection.exec_driver_sql('ANALYZE')
+            if pragma('journal_mode')[0][0] == 'wal':
+                pragma('wal_checkpoint(TRUNCATE)')
+        print("Vacuum complete")
+
+def rebuild_summary():
+    with app.app_context():
+        print("Rebuilding task summary counters...")
+        TaskCounter.rebuild()
+        db.session.commit()
+        print(f"Wrote {TaskCounter.query.count()} counters")
+
 def reset_db():
     with app.app_context():
         print("Dropping tables...")
+        with db.engine.begin() as connection:
+            drop_search_index(connection)
         db.drop_all()
         db.create_all()
         print("Reset complete")
@@ -64,5 +199,16 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--reset":
         reset_db()
         init_db()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--rebuild-summary":
+        rebuild_summary()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--compact-changes":
+        compact_changes()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--archive":
+        archive_tasks()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--vacuum":
+        vacuum_db()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--seed":
+        # python init_db.py --seed [users] [tasks_per_user]
+        seed_db(*(int(arg) for arg in sys.argv[2:4]))
     else:
         init_db()
\ No newline at end of file
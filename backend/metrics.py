@@ -0,0 +1,230 @@
+"""Dependency-free request, SQL and bot metrics in the Prometheus text format.
+
+Flask requests are timed in before/after_request hooks; SQL statements are
+counted and timed with SQLAlchemy cursor events and attributed to the request
+running on the current thread. Everything is aggregated in memory and rendered
+by ``registry.render()`` for the /metrics endpoint.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series):
+                    cumulative += count
+                    le = _labels(self.labelnames, labels, [f'le="{_number(bound)}"'])
+                    lines.append(f'{self.name}_bucket{le} {cumulative}')
+                suffix = _labels(self.labelnames, labels)
+                lines.append(f'{self.name}_sum{suffix} {_number(series[-1])}')
+                lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Gauge read from ``collect()`` at scrape time; it returns a number or a
+    dict mapping label value tuples to numbers."""
+
+    def __init__(self, name, help, collect, labelnames=()):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.labelnames = labelnames
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'endpoint', 'status')))
+http_response_bytes = registry.register(Histogram(
+    'http_response_size_bytes', 'HTTP response body size', ('method', 'endpoint'), SIZE_BUCKETS))
+http_request_sql_statements = registry.register(Histogram(
+    'http_request_sql_statements', 'SQL statements executed per HTTP request',
+    ('method', 'endpoint'), COUNT_BUCKETS))
+http_request_sql_seconds = registry.register(Histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL per HTTP request', ('method', 'endpoint')))
+sql_statements_total = registry.register(Counter(
+    'sql_statements_total', 'SQL statements executed, including the bot and background work'))
+sql_seconds_total = registry.register(Counter(
+    'sql_duration_seconds_total', 'Time spent executing SQL statements'))
+slow_requests_total = registry.register(Counter(
+    'http_slow_requests_total', 'HTTP requests slower than SLOW_REQUEST_MS', ('method', 'endpoint')))
+bot_handler_seconds = registry.register(Histogram(
+    'bot_handler_duration_seconds', 'Telegram bot handler latency', ('handler', 'outcome')))
+
+
+class QueryStats:
+    __slots__ = ('count', 'seconds', 'statements')
+
+    def __init__(self, capture=False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = [] if capture else None
+
+
+_current = threading.local()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    sql_statements_total.inc()
+    sql_seconds_total.inc(elapsed)
+    stats = getattr(_current, 'stats', None)
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append((elapsed, ' '.join(statement.split())[:500]))
+
+
+def instrument_app(app, slow_request_ms=0):
+    """Time every request. With ``slow_request_ms`` set, requests slower than
+    that are logged with the SQL statements they ran."""
+    slow_seconds = slow_request_ms / 1000 if slow_request_ms else None
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        _current.stats = QueryStats(capture=slow_seconds is not None)
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        stats, _current.stats = getattr(_current, 'stats', None), None
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # The rule, not the path, so /api/tasks/<id> is one series
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+        http_request_seconds.observe(elapsed, method, endpoint, str(response.status_code))
+        if response.content_length is not None:
+            http_response_bytes.observe(response.content_length, method, endpoint)
+        if stats is not None:
+            http_request_sql_statements.observe(stats.count, method, endpoint)
+            http_request_sql_seconds.observe(stats.seconds, method, endpoint)
+            if slow_seconds is not None and elapsed >= slow_seconds:
+                slow_requests_total.inc(1, method, endpoint)
+                queries = ''.join(f'\n  {seconds * 1000:.1f} ms  {sql}' for seconds, sql in stats.statements)
+                app.logger.warning('Slow request %s %s: %.1f ms, %d SQL statements (%.1f ms)%s',
+                                   method, request.full_path.rstrip('?'), elapsed * 1000,
+                                   stats.count, stats.seconds * 1000, queries)
+        return response
+
+
+def timed_handler(name, handler):
+    """Wrap a bot handler coroutine so its latency lands in bot_handler_seconds."""
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = await handler(update, context)
+            outcome = 'ok'
+            return result
+        finally:
+            bot_handler_seconds.observe(time.perf_counter() - started, name, outcome)
+    return wrapper
@@ -0,0 +1,31 @@
+"""add composite indexes for task access paths
+
+Revision ID: 3f2a9c1d7b10
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index('ix_task_user_created', ['user_id', 'created_at', 'id'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_task_user_completed_created', ['user_id', 'completed', 'created_at'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_task_user_priority_created', ['user_id', 'priority', 'created_at'], unique=False, if_not_exists=True)
+        batch_op.create_index('ix_task_user_due_date', ['user_id', 'due_date'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_due_date', if_exists=True)
+        batch_op.drop_index('ix_task_user_priority_created', if_exists=True)
+        batch_op.drop_index('ix_task_user_completed_created', if_exists=True)
+        batch_op.drop_index('ix_task_user_created', if_exists=True)
@@ -0,0 +1,33 @@
+"""add token_revocation table
+
+Revision ID: a7d3e9f1c284
+Revises: f2c6a9d3b748
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9f1c284'
+down_revision = 'f2c6a9d3b748'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'token_revocation',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('generation', sa.Integer(), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('ix_token_revocation_updated_at', 'token_revocation', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_token_revocation_updated_at', table_name='token_revocation')
+    op.drop_table('token_revocation')
@@ -0,0 +1,56 @@
+"""add task_change log, sync_client and user.changes_floor
+
+Revision ID: b3f8d1c6e905
+Revises: a7d3e9f1c284
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f8d1c6e905'
+down_revision = 'a7d3e9f1c284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'task_change',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(length=10), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True,
+    )
+    op.create_index('ix_task_change_user_seq', 'task_change', ['user_id', 'seq'], unique=False)
+    op.create_index('ix_task_change_task_seq', 'task_change', ['task_id', 'seq'], unique=False)
+    op.create_table(
+        'sync_client',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.String(length=64), nullable=False),
+        sa.Column('last_seq', sa.Integer(), nullable=False),
+        sa.Column('seen_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'client_id'),
+    )
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('changes_floor', sa.Integer(), server_default='0', nullable=False))
+
+    # Existing tasks start the log, so syncing from 0 returns all of them
+    op.execute("""
+        INSERT INTO task_change (user_id, task_id, op, changed_at)
+        SELECT user_id, id, 'upsert', CURRENT_TIMESTAMP FROM task WHERE user_id IS NOT NULL ORDER BY id
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('changes_floor')
+    op.drop_table('sync_client')
+    op.drop_index('ix_task_change_task_seq', table_name='task_change')
+    op.drop_index('ix_task_change_user_seq', table_name='task_change')
+    op.drop_table('task_change')
@@ -0,0 +1,56 @@
+"""add FTS5 search index over tasks
+
+Revision ID: c5d7e2f4a813
+Revises: 8b41e6d2a9f3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d7e2f4a813'
+down_revision = '8b41e6d2a9f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+            owner, title, description, tags,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN
+            INSERT INTO task_fts(rowid, owner, title, description, tags)
+            VALUES (new.id, 'u' || new.user_id, new.title, coalesce(new.description, ''), coalesce(new.tags, ''));
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN
+            DELETE FROM task_fts WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description, tags, user_id ON task BEGIN
+            UPDATE task_fts
+            SET owner = 'u' || new.user_id, title = new.title,
+                description = coalesce(new.description, ''), tags = coalesce(new.tags, '')
+            WHERE rowid = new.id;
+        END
+    """)
+    op.execute("DELETE FROM task_fts")
+    op.execute("""
+        INSERT INTO task_fts(rowid, owner, title, description, tags)
+        SELECT id, 'u' || user_id, title, coalesce(description, ''), coalesce(tags, '') FROM task
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS task_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ai")
+    op.execute("DROP TABLE IF EXISTS task_fts")
@@ -0,0 +1,101 @@
+"""add task_archive, autoincrement task ids and the archival index
+
+Revision ID: c9a4e7b2f516
+Revises: b3f8d1c6e905
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a4e7b2f516'
+down_revision = 'b3f8d1c6e905'
+branch_labels = None
+depends_on = None
+
+FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, owner, title, description, tags)
+        VALUES (new.id, 'u' || new.user_id, new.title, coalesce(new.description, ''), coalesce(new.tags, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN
+        DELETE FROM task_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description, tags, user_id ON task BEGIN
+        UPDATE task_fts
+        SET owner = 'u' || new.user_id, title = new.title,
+            description = coalesce(new.description, ''), tags = coalesce(new.tags, '')
+        WHERE rowid = new.id;
+    END
+    """,
+]
+
+
+def upgrade():
+    # Without AUTOINCREMENT SQLite hands out max(id) + 1, which could be the
+    # id of an archived task. The table is rebuilt to switch it on; the FTS
+    # triggers go with the old table, the index itself is keyed by id and stays.
+    op.execute("DROP TRIGGER IF EXISTS task_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS task_fts_ai")
+    with op.batch_alter_table('task', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    for statement in FTS_TRIGGERS:
+        op.execute(statement)
+
+    op.create_index('ix_task_completed_updated', 'task', ['updated_at'], unique=False,
+                    sqlite_where=sa.text('completed = 1'))
+
+    op.create_table(
+        'task_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.Column('priority', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=100), nullable=False),
+        sa.Column('tags', sa.Text(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_task_archive_user_created', 'task_archive', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    # Archived tasks go back into task (the insert trigger re-indexes them)
+    # and get their tag links back. Run init_db.py --rebuild-summary afterwards
+    # to count them again. task keeps AUTOINCREMENT, which older code ignores.
+    op.execute("""
+        INSERT INTO task (id, title, description, completed, priority, created_at, updated_at,
+                          due_date, user_id, status, tags)
+        SELECT id, title, description, completed, priority, created_at, updated_at,
+               due_date, user_id, status, tags
+        FROM task_archive
+    """)
+    op.execute("""
+        INSERT OR IGNORE INTO tag (user_id, name, task_count)
+        SELECT DISTINCT a.user_id, j.value, 0
+        FROM task_archive a, json_each(a.tags) j
+        WHERE a.user_id IS NOT NULL
+    """)
+    op.execute("""
+        INSERT OR IGNORE INTO task_tags (task_id, tag_id)
+        SELECT a.id, t.id
+        FROM task_archive a, json_each(a.tags) j
+        JOIN tag t ON t.user_id = a.user_id AND t.name = j.value
+    """)
+    op.execute("UPDATE tag SET task_count = (SELECT count(*) FROM task_tags WHERE tag_id = tag.id)")
+    op.drop_index('ix_task_archive_user_created', table_name='task_archive')
+    op.drop_table('task_archive')
+    op.drop_index('ix_task_completed_updated', table_name='task')
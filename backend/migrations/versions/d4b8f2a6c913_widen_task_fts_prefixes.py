@@ -0,0 +1,40 @@
+"""index 2-6 character prefixes in task_fts
+
+Revision ID: d4b8f2a6c913
+Revises: c9a4e7b2f516
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8f2a6c913'
+down_revision = 'c9a4e7b2f516'
+branch_labels = None
+depends_on = None
+
+
+def rebuild(prefix):
+    # FTS5 options are fixed at creation, so the table is recreated and refilled;
+    # the task_fts_* triggers only name the table and keep working
+    op.execute("DROP TABLE IF EXISTS task_fts")
+    op.execute(f"""
+        CREATE VIRTUAL TABLE task_fts USING fts5(
+            owner, title, description, tags,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '{prefix}'
+        )
+    """)
+    op.execute("""
+        INSERT INTO task_fts(rowid, owner, title, description, tags)
+        SELECT id, 'u' || user_id, title, coalesce(description, ''), coalesce(tags, '') FROM task
+    """)
+
+
+def upgrade():
+    rebuild('2 3 4 5 6')
+
+
+def downgrade():
+    rebuild('2 3')
@@ -0,0 +1,83 @@
+"""normalize task tags into tag and task_tags tables
+
+Revision ID: d91b3a6c5e27
+Revises: c5d7e2f4a813
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91b3a6c5e27'
+down_revision = 'c5d7e2f4a813'
+branch_labels = None
+depends_on = None
+
+
+def parse_tags(value):
+    # Same rules as Task.parse_tags at the time of this revision
+    if not value:
+        return []
+    try:
+        value = json.loads(value)
+    except ValueError:
+        value = value.split(',')
+    if not isinstance(value, list):
+        value = [value]
+    names = []
+    for item in value:
+        name = str(item).strip()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    tag = op.create_table(
+        'tag',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('task_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'name', name='uq_tag_user_name'),
+    )
+    task_tags = op.create_table(
+        'task_tags',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['tag_id'], ['tag.id']),
+        sa.ForeignKeyConstraint(['task_id'], ['task.id']),
+        sa.PrimaryKeyConstraint('task_id', 'tag_id'),
+    )
+    op.create_index('ix_task_tags_tag_task', 'task_tags', ['tag_id', 'task_id'], unique=False)
+
+    connection = op.get_bind()
+    tag_ids, counts, links = {}, {}, []
+    rows = connection.execute(sa.text(
+        "SELECT id, user_id, tags FROM task WHERE tags IS NOT NULL AND tags != '' AND user_id IS NOT NULL"))
+    for task_id, user_id, tags in rows:
+        for name in parse_tags(tags):
+            key = (user_id, name)
+            if key not in tag_ids:
+                tag_ids[key] = len(tag_ids) + 1
+            counts[key] = counts.get(key, 0) + 1
+            links.append({'task_id': task_id, 'tag_id': tag_ids[key]})
+
+    if tag_ids:
+        op.bulk_insert(tag, [
+            {'id': tag_id, 'user_id': user_id, 'name': name, 'task_count': counts[(user_id, name)]}
+            for (user_id, name), tag_id in tag_ids.items()
+        ])
+        op.bulk_insert(task_tags, links)
+
+
+def downgrade():
+    op.drop_index('ix_task_tags_tag_task', table_name='task_tags')
+    op.drop_table('task_tags')
+    op.drop_table('tag')
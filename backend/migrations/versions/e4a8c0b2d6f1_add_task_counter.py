@@ -0,0 +1,46 @@
+"""add materialized per-user task counters
+
+Revision ID: e4a8c0b2d6f1
+Revises: d91b3a6c5e27
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8c0b2d6f1'
+down_revision = 'd91b3a6c5e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'task_counter',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=40), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id', 'key'),
+    )
+    op.execute("""
+        INSERT INTO task_counter (user_id, key, count)
+        SELECT user_id, 'total', count(*) FROM task WHERE user_id IS NOT NULL GROUP BY user_id
+        UNION ALL
+        SELECT user_id, 'status:' || status, count(*) FROM task WHERE user_id IS NOT NULL GROUP BY user_id, status
+        UNION ALL
+        SELECT user_id, 'priority:' || priority, count(*) FROM task WHERE user_id IS NOT NULL GROUP BY user_id, priority
+        UNION ALL
+        SELECT user_id, CASE WHEN completed THEN 'completed:true' ELSE 'completed:false' END, count(*)
+        FROM task WHERE user_id IS NOT NULL GROUP BY user_id, completed
+        UNION ALL
+        SELECT user_id, 'due:' || date(due_date), count(*) FROM task
+        WHERE user_id IS NOT NULL AND due_date IS NOT NULL AND NOT completed
+        GROUP BY user_id, date(due_date)
+    """)
+
+
+def downgrade():
+    op.drop_table('task_counter')
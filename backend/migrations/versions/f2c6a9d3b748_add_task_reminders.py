@@ -0,0 +1,32 @@
+"""add task_reminder table and due_date index
+
+Revision ID: f2c6a9d3b748
+Revises: e4a8c0b2d6f1
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6a9d3b748'
+down_revision = 'e4a8c0b2d6f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'task_reminder',
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('due_date', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('task_id', 'due_date'),
+    )
+    op.create_index('ix_task_due_date', 'task', ['due_date'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_task_due_date', table_name='task', if_exists=True)
+    op.drop_table('task_reminder')
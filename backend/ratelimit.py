@@ -0,0 +1,156 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def parse_limit(text):
+    """"20/60" -> 20 requests per 60 seconds, as (capacity, refill rate per second).
+    Empty or "0" disables the limit."""
+    if not text or text.strip() == '0':
+        return None
+    count, _, seconds = text.partition('/')
+    capacity = int(count)
+    return capacity, capacity / float(seconds or 1)
+
+
+class MemoryBuckets:
+    """Token buckets in a dict, for one process.
+
+    Each limit keeps its buckets in least recently used order. A bucket idle
+    for ``capacity / rate`` seconds has refilled completely and is the same as
+    no bucket, so every check drops such buckets from the old end; memory stays
+    proportional to the keys active within one refill period.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, name, key, capacity, rate):
+        now = time.monotonic()
+        refill = capacity / rate
+        with self._lock:
+            buckets = self._buckets.get(name)
+            if buckets is None:
+                buckets = self._buckets[name] = OrderedDict()
+            while buckets:
+                oldest = next(iter(buckets.values()))
+                if now - oldest[1] < refill:
+                    break
+                buckets.popitem(last=False)
+            state = buckets.pop(key, None)
+            tokens = capacity if state is None else min(capacity, state[0] + (now - state[1]) * rate)
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                return 0.0
+            buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def size(self):
+        with self._lock:
+            return sum(len(buckets) for buckets in self._buckets.values())
+
+
+class SharedBuckets:
+    """Token buckets in a SQLite file shared by every process that opens it.
+
+    Point ``path`` at tmpfs (e.g. /dev/shm) so gunicorn workers enforce one
+    budget without touching the SD card. A check is a single upsert on the
+    primary key, atomic across processes; rows past their refill time are
+    deleted every ``sweep_every`` checks.
+    """
+
+    TAKE_SQL = """
+        INSERT INTO rate_bucket (name, key, tokens, updated_at, expires_at)
+        VALUES (:name, :key, :capacity - 1, :now, :expires_at)
+        ON CONFLICT (name, key) DO UPDATE SET
+            tokens = min(:capacity, tokens + (:now - updated_at) * :rate) - 1,
+            updated_at = :now,
+            expires_at = :expires_at
+        WHERE min(:capacity, tokens + (:now - updated_at) * :rate) >= 1
+        RETURNING tokens
+    """
+
+    def __init__(self, path, sweep_every=1000):
+        self.path = path
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._checks = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            # Throwaway state: nothing needs to survive a crash
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS rate_bucket (
+                    name TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL, expires_at REAL NOT NULL,
+                    PRIMARY KEY (name, key)
+                ) WITHOUT ROWID
+            """)
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_rate_bucket_expires ON rate_bucket (expires_at)')
+            self._local.connection = connection
+        return connection
+
+    def take(self, name, key, capacity, rate):
+        connection = self._connection()
+        now = time.time()
+        params = {'name': name, 'key': str(key), 'capacity': capacity, 'rate': rate,
+                  'now': now, 'expires_at': now + capacity / rate}
+        self._checks += 1
+        if self._checks % self.sweep_every == 0:
+            connection.execute('DELETE FROM rate_bucket WHERE expires_at < ?', (now,))
+        if connection.execute(self.TAKE_SQL, params).fetchone() is not None:
+            return 0.0
+        # Out of tokens: the upsert changed nothing, read the bucket to say how long to wait
+        row = connection.execute('SELECT tokens, updated_at FROM rate_bucket WHERE name = ? AND key = ?',
+                                 (name, str(key))).fetchone()
+        tokens = min(capacity, row[0] + (now - row[1]) * rate) if row else capacity
+        return max(0.0, (1 - tokens) / rate)
+
+    def size(self):
+        return self._connection().execute('SELECT count(*) FROM rate_bucket').fetchone()[0]
+
+
+class RateLimiter:
+    """Named token-bucket limits, e.g. ``{'auth': (20, 20 / 60)}``.
+
+    ``hit(name, key)`` spends one token from ``key``'s bucket and raises
+    ``RateLimited`` with the seconds until the next token when it is empty.
+    Limits that are not configured never raise.
+    """
+
+    def __init__(self, limits, backend=None):
+        self.limits = {name: limit for name, limit in limits.items() if limit}
+        self.backend = backend or MemoryBuckets()
+        self.limited = {name: 0 for name in self.limits}
+
+    def check(self, name, key):
+        """Seconds to wait before ``key`` may proceed, 0 if it may now."""
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0.0
+        retry_after = self.backend.take(name, key, *limit)
+        if retry_after:
+            self.limited[name] += 1
+        return retry_after
+
+    def hit(self, name, key):
+        retry_after = self.check(name, key)
+        if retry_after:
+            raise RateLimited(retry_after)
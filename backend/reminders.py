@@ -0,0 +1,180 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
+
+from telegram.error import Forbidden, BadRequest
+
+
+def to_utc_naive(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ReminderScheduler:
+    """Sends Telegram reminders ``lead`` before task deadlines.
+
+    Upcoming deadlines are loaded from the due_date index one ``horizon`` at a
+    time into a heap keyed by fire time. Task events from the broker add new or
+    moved deadlines in between loads; entries are re-validated against the
+    database right before sending, so deleted, completed or rescheduled tasks
+    are skipped. Sent reminders are recorded per (task, due_date) so a restart
+    never resends them, and a changed deadline earns a fresh reminder.
+
+    A failed pass (a locked database, Telegram unreachable) is logged and
+    retried after ``retry_delay`` seconds, doubling up to ``max_retry_delay``,
+    with the deadlines reloaded from the database.
+    """
+
+    def __init__(self, bot, db, Task, User, TaskReminder, broker,
+                 lead=timedelta(hours=1), horizon=timedelta(hours=1),
+                 batch_size=20, rate_per_second=20.0, retry_delay=1.0, max_retry_delay=60.0):
+        self.bot = bot
+        self.db = db
+        self.Task = Task
+        self.User = User
+        self.TaskReminder = TaskReminder
+        self.broker = broker
+        self.lead = lead
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.rate_per_second = rate_per_second
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._heap = []
+        self._queued = set()
+        self._loaded_until = None
+        self._wakeup = None
+        self._loop = None
+        self.sent = 0
+        self.failures = 0
+
+    def _push(self, task_id, due_date):
+        key = (task_id, due_date)
+        if key in self._queued:
+            return
+        self._queued.add(key)
+        heapq.heappush(self._heap, (due_date - self.lead, task_id, due_date))
+
+    # --- database helpers, run on the bot's DB pool ---
+
+    def _upcoming(self, now, until):
+        Task, TaskReminder = self.Task, self.TaskReminder
+        sent = self.db.select(TaskReminder.task_id).filter(
+            TaskReminder.task_id == Task.id, TaskReminder.due_date == Task.due_date)
+        return self.db.session.execute(
+            self.db.select(Task.id, Task.due_date)
+            .filter(Task.due_date > now, Task.due_date <= until + self.lead,
+                    Task.completed.is_(False), ~sent.exists())
+        ).all()
+
+    def _pending(self, keys):
+        Task, User, TaskReminder = self.Task, self.User, self.TaskReminder
+        rows = self.db.session.execute(
+            self.db.select(Task.id, Task.title, Task.due_date, User.telegram_id)
+            .join(User, User.id == Task.user_id)
+            .filter(Task.id.in_([task_id for task_id, _ in keys]), Task.completed.is_(False),
+                    User.telegram_id.isnot(None), User.is_active.is_(True))
+        ).all()
+        wanted = set(keys)
+        rows = [row for row in rows if (row.id, row.due_date) in wanted]
+        if not rows:
+            return []
+        already = set(self.db.session.execute(
+            self.db.select(TaskReminder.task_id, TaskReminder.due_date)
+            .filter(TaskReminder.task_id.in_([row.id for row in rows]))).all())
+        return [row for row in rows if (row.id, row.due_date) not in already]
+
+    def _mark_sent(self, keys):
+        now = datetime.utcnow()
+        self.db.session.execute(
+            self.db.insert(self.TaskReminder).prefix_with('OR IGNORE'),
+            [{'task_id': task_id, 'due_date': due_date, 'sent_at': now} for task_id, due_date in keys])
+        self.db.session.commit()
+
+    # --- scheduling ---
+
+    def _on_event(self, event):
+        # Broker callback; may run on a Flask thread, so hop onto the loop
+        _, _, event_type, data = event
+        if event_type in ('created', 'updated') and data.get('due_date') and not data.get('completed'):
+            self._loop.call_soon_threadsafe(self._schedule, data['id'], to_utc_naive(data['due_date']))
+
+    def _schedule(self, task_id, due_date):
+        if self._loaded_until is not None and due_date - self.lead <= self._loaded_until:
+            self._push(task_id, due_date)
+            self._wakeup.set()
+
+    async def refresh(self):
+        now = datetime.utcnow()
+        until = now + self.horizon
+        for task_id, due_date in await self.bot.run_db(self._upcoming, now, until):
+            self._push(task_id, due_date)
+        self._loaded_until = until
+
+    async def fire_due(self):
+        now = datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, task_id, due_date = heapq.heappop(self._heap)
+            self._queued.discard((task_id, due_date))
+            due.append((task_id, due_date))
+
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            started = time.monotonic()
+            delivered = []
+            for row in await self.bot.run_db(self._pending, batch):
+                try:
+                    await self.bot.application.bot.send_message(
+                        chat_id=row.telegram_id,
+                        text=f"⏰ Reminder: {row.title}\nDue: {row.due_date.strftime('%Y-%m-%d %H:%M')} UTC")
+                    delivered.append((row.id, row.due_date))
+                except (Forbidden, BadRequest):
+                    # Blocked bot or unknown chat: retrying won't help
+                    delivered.append((row.id, row.due_date))
+                except Exception as e:
+                    print(f"Reminder for task {row.id} failed: {e}")
+            if delivered:
+                await self.bot.run_db(self._mark_sent, delivered)
+                self.sent += len(delivered)
+            # Keep under Telegram's global rate limit
+            min_duration = len(batch) / self.rate_per_second
+            elapsed = time.monotonic() - started
+            if elapsed < min_duration:
+                await asyncio.sleep(min_duration - elapsed)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.broker.add_listener(self._on_event)
+        retries = 0
+        try:
+            while True:
+                try:
+                    if self._loaded_until is None or datetime.utcnow() >= self._loaded_until:
+                        await self.refresh()
+                    now = datetime.utcnow()
+                    next_fire = self._heap[0][0] if self._heap else self._loaded_until
+                    timeout = max(0.0, (min(next_fire, self._loaded_until) - now).total_seconds())
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    await self.fire_due()
+                    retries = 0
+                except Exception as e:
+                    # Reminders popped for sending are no longer in the heap;
+                    # the reload puts back any that were not recorded as sent
+                    self.failures += 1
+                    delay = min(self.max_retry_delay, self.retry_delay * 2 ** retries)
+                    retries += 1
+                    print(f"Reminders failed, retrying in {delay:g}s: {e}")
+                    self._loaded_until = None
+                    await asyncio.sleep(delay)
+        finally:
+            self.broker.remove_listener(self._on_event)
@@ -0,0 +1,136 @@
+import html
+import re
+
+from sqlalchemy import Boolean, DateTime, text
+
+# FTS5 index over task title, description and tags. It stores its own copy of
+# the text so snippets work, plus an "owner" token (u<user_id>) so the match
+# is restricted to one user's tasks inside the index instead of afterwards:
+# ANDed with the owner term, FTS5 seeks through the shared doclists instead of
+# reading them, so a search costs about the same at any table size. That only
+# holds for whole terms and prefixes of an indexed length; anything else is
+# expanded across every user's rows, so the query builder never sends one.
+# Kept in sync by triggers; the Alembic revisions creating it hold the same SQL.
+PREFIX_LENGTHS = (2, 3, 4, 5, 6)
+
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+        owner, title, description, tags,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, owner, title, description, tags)
+        VALUES (new.id, 'u' || new.user_id, new.title, coalesce(new.description, ''), coalesce(new.tags, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN
+        DELETE FROM task_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description, tags, user_id ON task BEGIN
+        UPDATE task_fts
+        SET owner = 'u' || new.user_id, title = new.title,
+            description = coalesce(new.description, ''), tags = coalesce(new.tags, '')
+        WHERE rowid = new.id;
+    END""",
+]
+
+DROP_SEARCH_INDEX_DDL = [
+    "DROP TRIGGER IF EXISTS task_fts_au",
+    "DROP TRIGGER IF EXISTS task_fts_ad",
+    "DROP TRIGGER IF EXISTS task_fts_ai",
+    "DROP TABLE IF EXISTS task_fts",
+]
+
+REBUILD_SEARCH_INDEX_SQL = [
+    "DELETE FROM task_fts",
+    """INSERT INTO task_fts(rowid, owner, title, description, tags)
+       SELECT id, 'u' || user_id, title, coalesce(description, ''), coalesce(tags, '') FROM task""",
+]
+
+# Matches come out of the index newest first (rowid order, no sort), and only
+# the newest SEARCH_CANDIDATES are scored. The score counts matched terms per
+# column with the old bm25 column weights; bm25 itself reads every user's
+# doclist for its term statistics, which costs tens of ms at a million tasks.
+# :refine is set when the last word was cut to an indexed prefix length, and
+# keeps only rows where a highlighted token really starts with the full word.
+# Highlights and snippets are built for the returned page only, with control
+# characters as markers: the text is the user's own, so mark_matches() escapes
+# it before turning the markers into <mark> tags. CROSS JOIN
+# keeps SQLite from running the MATCH again for the outer query instead of
+# looking up best.id.
+SEARCH_CANDIDATES = 250
+
+SEARCH_SQL = text("""
+    WITH candidates AS (
+        SELECT rowid AS id,
+               10 * (length(highlight(task_fts, 1, char(1), '')) - length(title))
+               + 2 * (length(highlight(task_fts, 2, char(1), '')) - length(description))
+               + 5 * (length(highlight(task_fts, 3, char(1), '')) - length(tags)) AS score
+        FROM task_fts
+        WHERE task_fts MATCH :match
+          AND (:refine IS NULL
+               OR instr(lower(highlight(task_fts, 1, char(1), '')), char(1) || :refine)
+               OR instr(lower(highlight(task_fts, 2, char(1), '')), char(1) || :refine)
+               OR instr(lower(highlight(task_fts, 3, char(1), '')), char(1) || :refine))
+        ORDER BY rowid DESC
+        LIMIT :candidates
+    ), best AS (
+        SELECT id, score FROM candidates ORDER BY score DESC, id DESC LIMIT :limit
+    )
+    SELECT t.id, t.title, t.status, t.priority, t.completed, t.due_date, t.tags,
+           highlight(task_fts, 1, char(2), char(3)) AS title_highlight,
+           snippet(task_fts, 2, char(2), char(3), '…', 12) AS snippet,
+           -best.score AS rank
+    FROM best
+    CROSS JOIN task_fts
+    CROSS JOIN task t
+    WHERE task_fts.rowid = best.id AND task_fts MATCH :match AND t.id = best.id
+    ORDER BY best.score DESC, best.id DESC
+""").columns(completed=Boolean, due_date=DateTime)
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+_MARKS = {ord('\x02'): '<mark>', ord('\x03'): '</mark>'}
+
+
+def mark_matches(text):
+    """HTML for a SEARCH_SQL highlight or snippet: the text escaped, the
+    match markers as <mark> tags."""
+    if text is None:
+        return None
+    return html.escape(text).translate(_MARKS)
+
+
+def search_params(q, user_id):
+    """Turn free text into parameters for SEARCH_SQL, or None when the text
+    contains no searchable words. Every word is quoted (so FTS operators in
+    user input are inert) and all words are required; earlier words match
+    whole terms and the last one, still being typed, matches as a prefix
+    once it is long enough to have a prefix index. A longer ASCII last word
+    is looked up by its longest indexed prefix and refined per row; SQLite's
+    lower() only folds ASCII, so other words keep the full prefix."""
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    *words, last = terms
+    refine = None
+    if len(last) > PREFIX_LENGTHS[-1] and last.isascii():
+        refine = last.lower()
+        last = last[:PREFIX_LENGTHS[-1]]
+    last = f'"{last}"*' if len(last) >= PREFIX_LENGTHS[0] else f'"{last}"'
+    words = ' '.join([f'"{term}"' for term in words] + [last])
+    return {'match': f'owner : u{int(user_id)} AND {{title description tags}} : ({words})', 'refine': refine}
+
+
+def create_search_index(connection):
+    for statement in SEARCH_INDEX_DDL:
+        connection.execute(text(statement))
+
+
+def drop_search_index(connection):
+    for statement in DROP_SEARCH_INDEX_DDL:
+        connection.execute(text(statement))
+
+
+def rebuild_search_index(connection):
+    for statement in REBUILD_SEARCH_INDEX_SQL:
+        connection.execute(text(statement))
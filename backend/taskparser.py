@@ -0,0 +1,185 @@
+"""Rule-based parser turning a chat message into task fields.
+
+One precompiled regex tokenizes the message in a single scan. Date, time and
+tag tokens are recognised by the regex itself; plain words are fed through a
+keyword trie that knows the multi-word priority and status phrases. Whatever
+is not recognised becomes the title. Times are interpreted as UTC, matching
+how the API stores due dates.
+"""
+import json
+import re
+from datetime import date, datetime, timedelta
+
+WEEKDAYS = {
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'tues': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'thur': 3, 'thurs': 3, 'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5, 'sunday': 6, 'sun': 6,
+}
+UNITS = {
+    'minute': 'minutes', 'minutes': 'minutes', 'min': 'minutes', 'mins': 'minutes',
+    'hour': 'hours', 'hours': 'hours', 'hr': 'hours', 'hrs': 'hours', 'h': 'hours',
+    'day': 'days', 'days': 'days', 'd': 'days',
+    'week': 'weeks', 'weeks': 'weeks', 'w': 'weeks',
+}
+DAY_WORDS = {'today': 0, 'tonight': 0, 'tomorrow': 1, 'tmrw': 1, 'tmr': 1}
+
+_weekday = '|'.join(sorted(WEEKDAYS, key=len, reverse=True))
+_weekday_full = '|'.join(name for name in WEEKDAYS if name.endswith('day'))
+_unit = '|'.join(sorted(UNITS, key=len, reverse=True))
+_day_word = '|'.join(DAY_WORDS)
+
+TOKEN = re.compile(rf"""
+    (?P<tag>\#(?P<tag_name>[\w-]+))
+  | (?P<relative>\bin\s+(?P<amount>\d+|an?)\s*(?P<unit>{_unit})\b)
+  | (?P<iso>\b(?:(?:on|by|due)\s+)?(?P<iso_date>\d{{4}}-\d{{2}}-\d{{2}})\b)
+  | (?P<weekday>\b(?:(?:by|due|on)\s+)?(?P<week_mod>next|this|on|by|due)\s+(?P<weekday_name>{_weekday})\b
+       | \b(?P<weekday_full>{_weekday_full})\b)
+  | (?P<dayword>\b(?:(?:by|due)\s+)?(?P<day_name>{_day_word})\b)
+  | (?P<time>(?:\b(?:at|by)\s+|@\s*|\b)(?P<hour>\d{{1,2}})(?::(?P<minute>\d{{2}}))?\s*(?P<ampm>am|pm)\b
+       | (?:\b(?:at|by)|@)\s*(?P<hour24>\d{{1,2}}):(?P<minute24>\d{{2}})\b)
+  | (?P<word>[\w']+)
+""", re.IGNORECASE | re.VERBOSE)
+
+# Keyword phrases -> (field, value). Multi-word phrases are matched through the trie.
+KEYWORDS = {
+    'urgent': ('priority', 'high'), 'important': ('priority', 'high'), 'asap': ('priority', 'high'),
+    'high priority': ('priority', 'high'), 'critical': ('priority', 'high'),
+    'later': ('priority', 'low'), 'someday': ('priority', 'low'), 'maybe': ('priority', 'low'),
+    'low priority': ('priority', 'low'), 'whenever': ('priority', 'low'),
+    'medium priority': ('priority', 'medium'),
+    # Status needs explicit phrases; a bare "done" is usually part of the title
+    'in progress': ('status', 'inprogress'), 'wip': ('status', 'inprogress'),
+    'already started': ('status', 'inprogress'),
+    'already done': ('status', 'done'), 'already finished': ('status', 'done'),
+}
+_END = object()
+
+
+def build_trie(phrases):
+    trie = {}
+    for phrase, value in phrases.items():
+        node = trie
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node[_END] = value
+    return trie
+
+
+KEYWORD_TRIE = build_trie(KEYWORDS)
+_SPACES = re.compile(r'\s+')
+
+
+class ParsedTask:
+    __slots__ = ('title', 'priority', 'status', 'tags', 'due_date')
+
+    def __init__(self, title, priority='medium', status='todo', tags=None, due_date=None):
+        self.title = title
+        self.priority = priority
+        self.status = status
+        self.tags = tags or []
+        self.due_date = due_date
+
+    def to_row(self, user_id):
+        return {
+            'title': self.title, 'user_id': user_id, 'priority': self.priority,
+            'status': self.status, 'tags': json.dumps(self.tags), 'due_date': self.due_date,
+        }
+
+
+def parse_task(text, now=None):
+    now = now or datetime.utcnow()
+    priority, status = 'medium', 'todo'
+    tags = []
+    day = None          # date the task is due on, if any
+    time_of_day = None  # (hour, minute), if any
+    exact = None        # full datetime from "in N units"
+    removed = []        # (start, end) spans that don't belong in the title
+
+    tokens = list(TOKEN.finditer(text))
+    i = 0
+    while i < len(tokens):
+        m = tokens[i]
+        kind = m.lastgroup
+        if kind == 'word':
+            # Walk the trie as far as the following words allow; keep the longest phrase
+            node, j, match, match_end = KEYWORD_TRIE, i, None, i
+            while j < len(tokens) and tokens[j].lastgroup == 'word':
+                node = node.get(tokens[j].group().lower())
+                if node is None:
+                    break
+                j += 1
+                if _END in node:
+                    match, match_end = node[_END], j
+            if match:
+                if match[0] == 'priority':
+                    priority = match[1]
+                else:
+                    status = match[1]
+                removed.append((m.start(), tokens[match_end - 1].end()))
+                i = match_end
+                continue
+            i += 1
+            continue
+        elif kind == 'tag':
+            name = m.group('tag_name')
+            if name not in tags:
+                tags.append(name)
+        elif kind == 'relative':
+            amount = m.group('amount').lower()
+            amount = 1 if amount in ('a', 'an') else int(amount)
+            try:
+                exact = now + timedelta(**{UNITS[m.group('unit').lower()]: amount})
+            except OverflowError:
+                # Past datetime.max ("in 99999999 days"): not a deadline, keep it in the title
+                i += 1
+                continue
+        elif kind == 'iso':
+            try:
+                day = date.fromisoformat(m.group('iso_date'))
+            except ValueError:
+                i += 1
+                continue
+        elif kind == 'weekday':
+            target = WEEKDAYS[(m.group('weekday_name') or m.group('weekday_full')).lower()]
+            ahead = (target - now.weekday()) % 7
+            # "next friday" is the first friday after today; plain "friday" may be today
+            if ahead == 0 and (m.group('week_mod') or '').lower() == 'next':
+                ahead = 7
+            day = (now + timedelta(days=ahead)).date()
+        elif kind == 'dayword':
+            name = m.group('day_name').lower()
+            day = (now + timedelta(days=DAY_WORDS[name])).date()
+            if name == 'tonight' and time_of_day is None:
+                time_of_day = (20, 0)
+        elif kind == 'time':
+            if m.group('hour24') is not None:
+                hour, minute = int(m.group('hour24')), int(m.group('minute24'))
+            else:
+                hour, minute = int(m.group('hour')), int(m.group('minute') or 0)
+                if hour > 12:
+                    i += 1
+                    continue
+                hour = hour % 12 + (12 if m.group('ampm').lower() == 'pm' else 0)
+            if hour >= 24 or minute >= 60:
+                i += 1
+                continue
+            time_of_day = (hour, minute)
+        removed.append(m.span())
+        i += 1
+
+    due_date = exact
+    if due_date is None and (day is not None or time_of_day is not None):
+        hour, minute = time_of_day if time_of_day is not None else (23, 59)
+        if day is None:
+            day = now.date()
+            if (hour, minute) <= (now.hour, now.minute):
+                day = day + timedelta(days=1)
+        due_date = datetime(day.year, day.month, day.day, hour, minute)
+
+    pieces, last = [], 0
+    for start, end in removed:
+        pieces.append(text[last:start])
+        last = end
+    pieces.append(text[last:])
+    title = _SPACES.sub(' ', ''.join(pieces)).strip(' ,;:-') or text.strip()
+    return ParsedTask(title[:100], priority, status, tags, due_date)
@@ -0,0 +1,81 @@
+import contextlib
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py reads its configuration when it is imported, so the environment has
+# to be in place first. The suite runs against a throwaway SQLite file.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db'),
+    'SECRET_KEY': 'test',
+    'JWT_SECRET_KEY': 'test-jwt-secret-key-0123456789abcdef',
+    'TELEGRAM_BOT_TOKEN': '123456:test',
+    'BCRYPT_LOG_ROUNDS': '4',
+    'RATE_LIMIT_AUTH': '0',
+    'RATE_LIMIT_AUTH_IP': '0',
+    'RATE_LIMIT_READ': '0',
+    'RATE_LIMIT_WRITE': '0',
+    'RATE_LIMIT_BOT': '0',
+})
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    import app as app_module
+    from init_db import create_schema
+
+    with app_module.app.app_context(), contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create an account and return ``(user_id, auth_headers)``."""
+    from app import User, db, issue_token
+
+    def make(**fields):
+        with app.app_context():
+            user = User(name='Test User', email=f'user{next(_emails)}@example.com', **fields)
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.commit()
+            return user.id, {'Authorization': 'Bearer ' + issue_token(user)}
+    return make
+
+
+@pytest.fixture
+def capture_sql(app):
+    """``with capture_sql() as statements:`` collects ``(sql, parameters)`` for
+    every statement sent to SQLite, from any thread."""
+    from sqlalchemy import event
+    from app import db
+
+    with app.app_context():
+        engine = db.engine
+
+    @contextlib.contextmanager
+    def capture():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters[0] if executemany and parameters else parameters))
+
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return capture
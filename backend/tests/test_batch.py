@@ -0,0 +1,53 @@
+import pytest
+
+
+def create(client, headers, tasks):
+    response = client.post('/api/tasks/batch', json={'tasks': tasks}, headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return [result['task'] for result in response.get_json()['results']]
+
+
+def test_batch_create_is_one_insert_in_item_order(client, make_user, capture_sql):
+    _, headers = make_user()
+    with capture_sql() as statements:
+        tasks = create(client, headers, [{'title': f'Task {i}', 'tags': ['a']} for i in range(50)])
+    assert [task['title'] for task in tasks] == [f'Task {i}' for i in range(50)]
+    assert len({task['id'] for task in tasks}) == 50
+    assert sum(sql.startswith('INSERT INTO task (') for sql, _ in statements) == 1
+    tags = client.get('/api/tags', headers=headers).get_json()
+    assert tags == [{'name': 'a', 'count': 50}]
+
+
+def test_batch_patch_rejects_duplicate_ids(client, make_user):
+    _, headers = make_user()
+    task, = create(client, headers, [{'title': 'Task', 'tags': ['x']}])
+    response = client.patch('/api/tasks/batch', json={'tasks': [
+        {'id': task['id'], 'priority': 'high'}, {'id': task['id'], 'priority': 'low'}]}, headers=headers)
+    assert response.status_code == 400
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['ok', 'error']
+    assert client.get('/api/tasks/summary', headers=headers).get_json()['by_priority'] == {'medium': 1}
+
+
+@pytest.mark.parametrize('item, message', [
+    ({'completed': 'no'}, 'completed must be true or false'),
+    ({'completed': 1}, 'completed must be true or false'),
+    ({'title': None}, 'title must be a string'),
+    ({'priority': ['high']}, 'priority must be a string'),
+    ({'description': {'text': 'x'}}, 'description must be a string'),
+    ({'due_date': 20300101}, 'Invalid due_date format. Use ISO format.'),
+])
+def test_batch_patch_checks_types(client, make_user, item, message):
+    _, headers = make_user()
+    task, = create(client, headers, [{'title': 'Task'}])
+    response = client.patch('/api/tasks/batch', json={'tasks': [{'id': task['id'], **item}]}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == message
+
+
+def test_batch_create_checks_types(client, make_user):
+    _, headers = make_user()
+    response = client.post('/api/tasks/batch', json={'tasks': [{'title': 'Ok'}, {'title': 42}]}, headers=headers)
+    assert response.status_code == 400
+    assert [result['status'] for result in response.get_json()['results']] == ['ok', 'error']
+    assert client.get('/api/tasks', headers=headers).get_json() == []
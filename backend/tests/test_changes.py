@@ -0,0 +1,89 @@
+import pytest
+
+from app import TaskChange, User, db
+
+
+def changes(client, headers, since, client_id=None):
+    query = {'since': since}
+    if client_id:
+        query['client_id'] = client_id
+    return client.get('/api/tasks/changes', query_string=query, headers=headers)
+
+
+def sync(client, headers, since, client_id):
+    """Page through the log from ``since`` as ``client_id``; returns next_since."""
+    while True:
+        body = changes(client, headers, since, client_id).get_json()
+        since = body['next_since']
+        if not body['has_more']:
+            return since
+
+
+def compact(app):
+    with app.app_context():
+        result = TaskChange.compact()
+        db.session.commit()
+    return result
+
+
+def markers(app, user_id):
+    with app.app_context():
+        return db.session.execute(
+            db.select(TaskChange.task_id, TaskChange.op).filter(TaskChange.user_id == user_id)
+            .order_by(TaskChange.seq)).all()
+
+
+@pytest.fixture
+def two_clients(app, client, make_user):
+    """A user syncing from a laptop and a phone. The phone has confirmed the
+    log up to B's delete and the laptop up to C's delete as well."""
+    user_id, headers = make_user()
+    response = client.post('/api/tasks/batch', json={'tasks': [{'title': t} for t in 'ABCD']}, headers=headers)
+    a, b, c, d = [result['task']['id'] for result in response.get_json()['results']]
+    assert client.put(f'/api/tasks/{a}', json={'title': 'A2'}, headers=headers).status_code == 200
+    assert client.delete(f'/api/tasks/{b}', headers=headers).status_code == 200
+
+    phone_seq = sync(client, headers, 0, 'laptop')
+    assert sync(client, headers, 0, 'phone') == phone_seq
+    # Asking for changes since N is what confirms N
+    changes(client, headers, phone_seq, 'phone')
+
+    assert client.delete(f'/api/tasks/{c}', headers=headers).status_code == 200
+    laptop_seq = sync(client, headers, phone_seq, 'laptop')
+    changes(client, headers, laptop_seq, 'laptop')
+    return user_id, headers, (a, b, c, d), phone_seq
+
+
+def test_compaction_keeps_tombstones_a_client_still_needs(app, client, two_clients):
+    user_id, _, (a, b, c, d), phone_seq = two_clients
+    compact(app)
+    # A's first upsert was superseded; B's tombstone was seen by both
+    # clients; C's was not confirmed by the phone yet
+    assert markers(app, user_id) == [(d, 'upsert'), (a, 'upsert'), (c, 'delete')]
+    with app.app_context():
+        assert db.session.get(User, user_id).changes_floor == phone_seq
+
+
+def test_client_behind_the_floor_gets_410(app, client, two_clients):
+    _, headers, (a, b, c, d), phone_seq = two_clients
+    compact(app)
+    response = changes(client, headers, phone_seq - 1)
+    assert response.status_code == 410
+    assert response.get_json()['floor'] == phone_seq
+
+    # The phone resumes where it confirmed and still learns of C's delete
+    body = changes(client, headers, phone_seq, 'phone').get_json()
+    assert body['deletes'] == [c]
+    # Starting over from 0 is always allowed
+    body = changes(client, headers, 0).get_json()
+    assert sorted(task['id'] for task in body['upserts']) == [a, d]
+
+
+def test_tombstones_without_syncing_clients_are_dropped(app, client, make_user):
+    user_id, headers = make_user()
+    response = client.post('/api/tasks', json={'title': 'Short-lived'}, headers=headers)
+    task_id = response.get_json()['id']
+    assert client.delete(f'/api/tasks/{task_id}', headers=headers).status_code == 200
+    compact(app)
+    assert markers(app, user_id) == []
+    assert changes(client, headers, 1).status_code == 410
@@ -0,0 +1,59 @@
+import re
+
+SAMPLE = re.compile(r'^(\w+)(\{.*\})? (\S+)$')
+
+
+def scrape(client):
+    """/metrics as ``{(name, labels): value}``, labels as a frozenset of pairs."""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        pairs = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels or ''))
+        samples[name, pairs] = float(value.replace('+Inf', 'inf'))
+    return samples
+
+
+def labels(**pairs):
+    return frozenset(pairs.items())
+
+
+def test_requests_show_up_per_route_with_their_sql(client, make_user):
+    _, headers = make_user()
+    task_id = client.post('/api/tasks', json={'title': 'Measured'}, headers=headers).get_json()['id']
+    route = dict(method='GET', endpoint='/api/tasks/<int:task_id>')
+    before = scrape(client)
+
+    assert client.get(f'/api/tasks/{task_id}', headers=headers).status_code == 200
+    assert client.get(f'/api/tasks/{task_id + 10 ** 6}', headers=headers).status_code == 404
+    after = scrape(client)
+
+    def delta(name, **pairs):
+        key = (name, labels(**pairs))
+        return after[key] - before.get(key, 0)
+
+    # One series per route rule and status, not per task id
+    assert delta('http_request_duration_seconds_count', status='200', **route) == 1
+    assert delta('http_request_duration_seconds_count', status='404', **route) == 1
+    assert not [key for key in after if any(value == f'/api/tasks/{task_id}' for _, value in key[1])]
+    # Buckets are cumulative and end at the count
+    assert after['http_request_duration_seconds_bucket', labels(status='200', le='+Inf', **route)] == \
+        after['http_request_duration_seconds_count', labels(status='200', **route)]
+
+    assert delta('http_request_sql_statements_count', **route) == 2
+    assert delta('http_request_sql_statements_sum', **route) >= 2
+    assert delta('http_request_sql_duration_seconds_sum', **route) > 0
+    assert delta('http_response_size_bytes_count', **route) == 2
+    assert delta('sql_statements_total') >= 2
+
+
+def test_cache_and_limiter_gauges_are_exported(client):
+    samples = scrape(client)
+    for stat in ('hits', 'misses'):
+        assert ('telegram_user_cache', labels(stat=stat)) in samples
+    assert ('token_revocation_refreshes', frozenset()) in samples
+    assert ('telegram_webhook_updates', labels(stat='pending')) in samples
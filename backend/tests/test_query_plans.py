@@ -0,0 +1,104 @@
+"""Every query behind the task list, the bot's /tasks pages, account
+deletion and archiving must reach the task table through an index. The queries are captured
+while the real code runs and replayed with EXPLAIN QUERY PLAN."""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import bot
+from app import ArchivedTask, Task, db
+
+SCAN = re.compile(r'^SCAN (\w+)')
+GET_TASKS_QUERIES = [
+    '',
+    '?completed=true',
+    '?completed=false',
+    '?priority=high',
+    '?completed=false&priority=low',
+    '?tags=home',
+    '?tags=home,work&tag_mode=all',
+    '?completed=false&priority=high&tags=work',
+    '?limit=5',
+    '?limit=5&fields=id,title',
+    '?limit=5&priority=high&tags=home',
+    '?include_archived=true',
+    '?include_archived=true&limit=5&completed=true&tags=home',
+]
+
+
+def full_scans(app, statements):
+    """The table scans in the plans of ``statements``, as (table, sql) pairs."""
+    tables = set(db.metadata.tables)
+    scans = []
+    with app.app_context():
+        connection = db.session.connection()
+        for sql, parameters in statements:
+            if sql.split(None, 1)[0].upper() not in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+                continue
+            for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, parameters):
+                match = SCAN.match(row[-1])
+                if match and match.group(1) in tables:
+                    scans.append((match.group(1), ' '.join(sql.split())))
+        db.session.rollback()
+    return scans
+
+
+@pytest.fixture
+def user_with_tasks(client, make_user):
+    user_id, headers = make_user()
+    tasks = [{'title': f'Task {i}', 'priority': ('low', 'medium', 'high')[i % 3],
+              'tags': [('home', 'work', 'uni')[i % 3], 'work'] if i % 2 else ['home'],
+              'due_date': f'2030-01-{i % 28 + 1:02d}T12:00:00'} for i in range(30)]
+    response = client.post('/api/tasks/batch', json={'tasks': tasks}, headers=headers)
+    assert response.status_code == 201
+    ids = [result['task']['id'] for result in response.get_json()['results']]
+    response = client.patch('/api/tasks/batch', json={'tasks': [{'id': i, 'completed': True} for i in ids[::4]]},
+                            headers=headers)
+    assert response.status_code == 200
+    return user_id, headers
+
+
+@pytest.mark.parametrize('query', GET_TASKS_QUERIES)
+def test_get_tasks_uses_indexes(app, client, capture_sql, user_with_tasks, query):
+    _, headers = user_with_tasks
+    with capture_sql() as statements:
+        response = client.get('/api/tasks' + query, headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        if isinstance(body, dict) and body['next_cursor']:
+            # The keyset condition of the following page
+            separator = '&' if '?' in query else '?'
+            response = client.get(f"/api/tasks{query}{separator}cursor={body['next_cursor']}", headers=headers)
+            assert response.status_code == 200
+    assert full_scans(app, statements) == []
+
+
+@pytest.mark.parametrize('direction', ['next', 'prev'])
+def test_bot_pending_page_uses_indexes(app, capture_sql, user_with_tasks, monkeypatch, direction):
+    user_id, _ = user_with_tasks
+    monkeypatch.setattr(bot, 'db', db)
+    monkeypatch.setattr(bot, 'Task', Task)
+    with app.app_context():
+        first, _ = bot.TaskBot._pending_page(user_id, 'next', None, 5)
+        with capture_sql() as statements:
+            rows, _ = bot.TaskBot._pending_page(user_id, direction, (first[-1].created_at, first[-1].id), 5)
+    assert rows
+    assert full_scans(app, statements) == []
+
+
+def test_delete_account_uses_indexes(app, client, capture_sql, user_with_tasks):
+    _, headers = user_with_tasks
+    with capture_sql() as statements:
+        response = client.delete('/api/auth/delete-account', headers=headers)
+    assert response.status_code == 200
+    assert full_scans(app, statements) == []
+
+
+def test_archive_uses_indexes(app, capture_sql, user_with_tasks):
+    with app.app_context():
+        with capture_sql() as statements:
+            moved = ArchivedTask.archive(datetime.utcnow() + timedelta(days=1), 5)
+        db.session.rollback()
+    assert moved == 5
+    assert full_scans(app, statements) == []
@@ -0,0 +1,49 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import app as app_module
+from ratelimit import RateLimiter, parse_limit
+
+
+@pytest.fixture
+def auth_limit(monkeypatch):
+    monkeypatch.setattr(app_module, 'rate_limiter', RateLimiter(
+        {'auth': parse_limit('2/60'), 'auth_ip': parse_limit('5/60')}))
+
+
+def login(client, email, ip='10.0.0.1'):
+    return client.post('/api/auth/login', json={'email': email, 'password': 'wrong-password'},
+                       environ_base={'REMOTE_ADDR': ip}).status_code
+
+
+def test_auth_limit_is_per_email_behind_one_address(client, auth_limit):
+    # Every login arrives from the frontend server's address: one email
+    # running out does not lock the others out
+    assert [login(client, 'alice@example.com') for _ in range(3)] == [401, 401, 429]
+    assert login(client, ' ALICE@example.com') == 429
+    assert login(client, 'dave@example.com') == 401
+
+
+def test_auth_limit_caps_each_address_across_emails(client, auth_limit):
+    # One password against many accounts runs into the per-IP budget
+    assert [login(client, f'user{i}@example.com') for i in range(7)] == [401] * 5 + [429] * 2
+    response = client.post('/api/auth/register', json={'name': 'Mallory', 'email': 'new@example.com',
+                                                       'password': 'password123'},
+                           environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert response.status_code == 429
+    assert login(client, 'user0@example.com', '10.0.0.2') == 401
+
+
+def test_auth_limit_is_per_client_address(client, auth_limit):
+    assert [login(client, 'bob@example.com', '10.0.0.1') for _ in range(3)] == [401, 401, 429]
+    assert login(client, 'bob@example.com', '10.0.0.2') == 401
+
+
+def test_proxy_fix_takes_the_client_address_from_the_proxy(app, client, auth_limit, monkeypatch):
+    monkeypatch.setattr(app, 'wsgi_app', ProxyFix(app.wsgi_app, x_for=1))
+
+    def via_proxy(client_ip):
+        return client.post('/api/auth/login', json={'email': 'carol@example.com', 'password': 'wrong-password'},
+                           headers={'X-Forwarded-For': client_ip}).status_code
+    assert [via_proxy('203.0.113.7') for _ in range(3)] == [401, 401, 429]
+    assert via_proxy('203.0.113.8') == 401
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import reminders as reminders_module
+from reminders import ReminderScheduler
+
+_telegram_ids = itertools.count(6 * 10 ** 8)
+
+
+class FakeBot:
+    """The parts of TaskBot the scheduler uses; messages are recorded."""
+
+    def __init__(self, app):
+        self.app = app
+        self.messages = []
+        self.application = SimpleNamespace(bot=self)
+
+    async def run_db(self, fn, *args):
+        with self.app.app_context():
+            return fn(*args)
+
+    async def send_message(self, chat_id, text):
+        self.messages.append((chat_id, text))
+
+
+@pytest.fixture
+def scheduler(app):
+    from app import Task, TaskReminder, User, broker, db
+
+    def make(**options):
+        options.setdefault('rate_per_second', 1000.0)
+        return ReminderScheduler(FakeBot(app), db, Task, User, TaskReminder, broker, **options)
+    return make
+
+
+@pytest.fixture
+def linked_user(client, make_user):
+    """A Telegram-linked account; returns its chat id, auth headers and a
+    helper creating a task due ``minutes`` from now."""
+    telegram_id = next(_telegram_ids)
+    _, headers = make_user(telegram_id=telegram_id)
+
+    def add_task(title, minutes):
+        due = (datetime.utcnow() + timedelta(minutes=minutes)).replace(microsecond=0)
+        response = client.post('/api/tasks', json={'title': title, 'due_date': due.isoformat()}, headers=headers)
+        assert response.status_code == 201
+        return response.get_json()['id']
+    return telegram_id, headers, add_task
+
+
+def sent_titles(bot, telegram_id):
+    return [text.splitlines()[0].removeprefix('⏰ Reminder: ') for chat_id, text in bot.messages
+            if chat_id == telegram_id]
+
+
+def travel(monkeypatch, minutes):
+    class Later(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcnow() + timedelta(minutes=minutes)
+    monkeypatch.setattr(reminders_module, 'datetime', Later)
+
+
+async def wait_until(predicate, timeout=5):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def one_pass(reminders):
+    await reminders.refresh()
+    await reminders.fire_due()
+
+
+def test_reminders_go_out_lead_before_the_deadline(scheduler, linked_user, monkeypatch):
+    telegram_id, _, add_task = linked_user
+    add_task('Soon', 30)
+    add_task('Later', 90)
+    add_task('Much later', 24 * 60)
+    reminders = scheduler(lead=timedelta(hours=1))
+    asyncio.run(one_pass(reminders))
+    assert sent_titles(reminders.bot, telegram_id) == ['Soon']
+
+    # 'Later' comes due for its reminder an hour before the deadline
+    travel(monkeypatch, 29)
+    asyncio.run(one_pass(reminders))
+    assert sent_titles(reminders.bot, telegram_id) == ['Soon']
+    travel(monkeypatch, 31)
+    asyncio.run(one_pass(reminders))
+    assert sent_titles(reminders.bot, telegram_id) == ['Soon', 'Later']
+
+
+def test_no_second_reminder_after_a_restart(scheduler, linked_user):
+    telegram_id, _, add_task = linked_user
+    add_task('Once', 10)
+    first = scheduler()
+    asyncio.run(one_pass(first))
+    assert sent_titles(first.bot, telegram_id) == ['Once']
+    restarted = scheduler()
+    asyncio.run(one_pass(restarted))
+    assert sent_titles(restarted.bot, telegram_id) == []
+
+
+def test_moved_deadline_gets_a_new_reminder(client, scheduler, linked_user):
+    telegram_id, headers, add_task = linked_user
+    task_id = add_task('Moving', 10)
+    reminders = scheduler()
+
+    async def scenario():
+        runner = asyncio.create_task(reminders.run())
+        try:
+            await wait_until(lambda: sent_titles(reminders.bot, telegram_id))
+            # Published by the API, picked up by the running scheduler
+            due = (datetime.utcnow() + timedelta(minutes=20)).replace(microsecond=0)
+            response = client.put(f'/api/tasks/{task_id}', json={'due_date': due.isoformat()}, headers=headers)
+            assert response.status_code == 200
+            await wait_until(lambda: len(sent_titles(reminders.bot, telegram_id)) == 2)
+        finally:
+            runner.cancel()
+    asyncio.run(scenario())
+    texts = [text for chat_id, text in reminders.bot.messages if chat_id == telegram_id]
+    assert len(texts) == 2 and texts[0] != texts[1]
+
+
+def test_failed_pass_is_logged_and_retried(scheduler, linked_user, monkeypatch, capsys):
+    telegram_id, _, add_task = linked_user
+    add_task('Despite a locked database', 10)
+    reminders = scheduler(retry_delay=0.01)
+    upcoming = reminders._upcoming
+    calls = []
+
+    def flaky_upcoming(*args):
+        calls.append(args)
+        if len(calls) <= 2:
+            raise RuntimeError('database is locked')
+        return upcoming(*args)
+    monkeypatch.setattr(reminders, '_upcoming', flaky_upcoming)
+
+    async def scenario():
+        runner = asyncio.create_task(reminders.run())
+        try:
+            await wait_until(lambda: sent_titles(reminders.bot, telegram_id))
+        finally:
+            runner.cancel()
+    asyncio.run(scenario())
+    assert reminders.failures == 2
+    assert capsys.readouterr().out.count('Reminders failed, retrying in') == 2
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_deleting_a_task_deletes_its_reminders(app, client, scheduler, linked_user, batch):
+    from app import TaskReminder, db
+
+    telegram_id, headers, add_task = linked_user
+    task_id = add_task('Reminded, then deleted', 10)
+    reminders = scheduler()
+    asyncio.run(one_pass(reminders))
+    assert sent_titles(reminders.bot, telegram_id) == ['Reminded, then deleted']
+
+    if batch:
+        response = client.delete('/api/tasks/batch', json={'ids': [task_id]}, headers=headers)
+    else:
+        response = client.delete(f'/api/tasks/{task_id}', headers=headers)
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.query(TaskReminder).filter_by(task_id=task_id).count() == 0
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def user_with_tasks(client, make_user):
+    _, headers = make_user()
+    tasks = [
+        {'title': 'Refactoring the parser', 'description': 'split the tokenizer out'},
+        {'title': 'Refactored code review', 'description': None},
+        {'title': 'Buy groceries', 'description': 'milk, eggs and a meeting snack'},
+        {'title': 'Team meeting notes', 'description': 'send them round', 'tags': ['work']},
+        {'title': 'Dentist', 'description': 'book a check-up', 'tags': ['health']},
+    ]
+    response = client.post('/api/tasks/batch', json={'tasks': tasks}, headers=headers)
+    assert response.status_code == 201
+    return headers
+
+
+def search(client, headers, q):
+    response = client.get('/api/tasks/search', query_string={'q': q}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [result['title'] for result in response.get_json()['results']]
+
+
+@pytest.mark.parametrize('q, titles', [
+    # The last word is a prefix, title matches outrank description matches
+    ('mee', ['Team meeting notes', 'Buy groceries']),
+    ('team meet', ['Team meeting notes']),
+    # Earlier words are whole terms
+    ('tea meeting', []),
+    # Longer than the indexed prefixes: looked up by "refact" and refined
+    ('refactoring', ['Refactoring the parser']),
+    ('refactored', ['Refactored code review']),
+    ('refact', ['Refactored code review', 'Refactoring the parser']),
+    ('health', ['Dentist']),
+    ('zebra', []),
+    # FTS syntax in the input is treated as plain words
+    ('dentist OR "NEAR(', []),
+    ('dentist*', ['Dentist']),
+])
+def test_search_matches(client, user_with_tasks, q, titles):
+    assert search(client, user_with_tasks, q) == titles
+
+
+def test_search_only_sees_own_tasks(client, make_user, user_with_tasks):
+    _, other = make_user()
+    assert search(client, other, 'meeting') == []
+
+
+def test_search_highlights_and_rejects_empty_query(client, user_with_tasks):
+    response = client.get('/api/tasks/search', query_string={'q': 'parser'}, headers=user_with_tasks)
+    result, = response.get_json()['results']
+    assert result['title_highlight'] == 'Refactoring the <mark>parser</mark>'
+    response = client.get('/api/tasks/search', query_string={'q': '  !! '}, headers=user_with_tasks)
+    assert response.status_code == 400
+
+
+def test_highlights_escape_the_task_text(client, make_user):
+    _, headers = make_user()
+    title = '<img src=x onerror=alert(1)> meeting & "notes"'
+    response = client.post('/api/tasks', json={'title': title, 'description': '<b>meeting</b> agenda'},
+                           headers=headers)
+    assert response.status_code == 201
+    result, = client.get('/api/tasks/search', query_string={'q': 'meeting'}, headers=headers).get_json()['results']
+    assert result['title'] == title
+    assert result['title_highlight'] == ('&lt;img src=x onerror=alert(1)&gt; <mark>meeting</mark> '
+                                         '&amp; &quot;notes&quot;')
+    assert result['snippet'] == '&lt;b&gt;<mark>meeting</mark>&lt;/b&gt; agenda'
+
+
+def test_autogenerate_leaves_the_search_index_alone(app, tmp_path):
+    import shutil
+    from flask_migrate import migrate
+
+    directory = tmp_path / 'migrations'
+    shutil.copytree(os.path.join(BACKEND_DIR, 'migrations'), directory,
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    before = set(os.listdir(directory / 'versions'))
+    with app.app_context():
+        migrate(directory=str(directory), message='probe')
+    for name in set(os.listdir(directory / 'versions')) - before:
+        assert 'task_fts' not in (directory / 'versions' / name).read_text()
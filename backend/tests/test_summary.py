@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+from app import TaskCounter, db
+
+
+def travel(monkeypatch, days):
+    """Make the app's clock run ``days`` ahead."""
+    class Later(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcnow() + timedelta(days=days)
+    monkeypatch.setattr(app_module, 'datetime', Later)
+
+
+def counters(app, user_id):
+    with app.app_context():
+        return dict(db.session.execute(
+            db.select(TaskCounter.key, TaskCounter.count).filter(TaskCounter.user_id == user_id)).all())
+
+
+@pytest.fixture
+def user_with_deadlines(client, make_user):
+    user_id, headers = make_user()
+    noon = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    tasks = [{'title': f'Due in {days}', 'due_date': (noon + timedelta(days=days)).isoformat()}
+             for days in (-4, -2, 1, 2, 5, 10, 30)]
+    response = client.post('/api/tasks/batch', json={'tasks': tasks}, headers=headers)
+    assert response.status_code == 201
+    ids = {result['task']['title']: result['task']['id'] for result in response.get_json()['results']}
+    return user_id, headers, ids
+
+
+def test_past_deadlines_share_one_counter(app, client, user_with_deadlines):
+    user_id, headers, _ = user_with_deadlines
+    keys = counters(app, user_id)
+    assert keys['overdue'] == 2
+    assert not [key for key in keys if key.startswith('due:') and key[4:] < datetime.utcnow().date().isoformat()]
+    summary = client.get('/api/tasks/summary', headers=headers).get_json()
+    assert (summary['overdue'], summary['due_this_week']) == (2, 3)
+
+
+def test_summary_rolls_days_that_passed(app, client, monkeypatch, user_with_deadlines):
+    user_id, headers, ids = user_with_deadlines
+    travel(monkeypatch, 3)
+    summary = client.get('/api/tasks/summary', headers=headers).get_json()
+    # -4, -2, 1 and 2 are now in the past; 5 is this week, 10 and 30 are not
+    assert (summary['overdue'], summary['due_this_week']) == (4, 1)
+    assert counters(app, user_id)['overdue'] == 4
+
+    # Completing a rolled task takes it out of "overdue"
+    response = client.put(f"/api/tasks/{ids['Due in 1']}", json={'completed': True}, headers=headers)
+    assert response.status_code == 200
+    assert client.get('/api/tasks/summary', headers=headers).get_json()['overdue'] == 3
+
+    # The incrementally kept counters match a rebuild from the tasks
+    before = counters(app, user_id)
+    with app.app_context():
+        TaskCounter.rebuild()
+        db.session.commit()
+    assert counters(app, user_id) == before
+
+
+def test_summary_reads_only_this_weeks_deadlines(app, client, capture_sql, user_with_deadlines):
+    _, headers, _ = user_with_deadlines
+    with capture_sql() as statements:
+        client.get('/api/tasks/summary', headers=headers)
+    selects = [(sql, params) for sql, params in statements if 'FROM task_counter' in sql and 'UNION ALL' in sql]
+    assert len(selects) == 1
+    with app.app_context():
+        sql, params = selects[0]
+        plan = [row[3] for row in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params)]
+    assert all('key' in step for step in plan if step.startswith('SEARCH task_counter'))
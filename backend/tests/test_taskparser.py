@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from taskparser import parse_task
+
+# Wednesday, 10:00 UTC
+NOW = datetime(2026, 10, 14, 10, 0)
+
+# message -> (title, priority, status, tags, due date)
+CORPUS = [
+    ("Finish essay tomorrow 5pm #uni urgent", ("Finish essay", 'high', 'todo', ['uni'], '2026-10-15T17:00')),
+    ("buy milk", ("buy milk", 'medium', 'todo', [], None)),
+    ("call the dentist next friday", ("call the dentist", 'medium', 'todo', [], '2026-10-16T23:59')),
+    ("Prepare slides in 3 days #work", ("Prepare slides", 'medium', 'todo', ['work'], '2026-10-17T10:00')),
+    ("renew passport someday", ("renew passport", 'low', 'todo', [], None)),
+    ("pay rent by 2026-12-01 #finance important", ("pay rent", 'high', 'todo', ['finance'], '2026-12-01T23:59')),
+    ("email the landlord tonight", ("email the landlord", 'medium', 'todo', [], '2026-10-14T20:00')),
+    ("review pull request at 14:30 #work wip", ("review pull request", 'medium', 'inprogress', ['work'],
+                                                '2026-10-14T14:30')),
+    ("Submit report by friday 9am high priority", ("Submit report", 'high', 'todo', [], '2026-10-16T09:00')),
+    ("standup wednesday", ("standup", 'medium', 'todo', [], '2026-10-14T23:59')),
+    ("next wednesday team lunch", ("team lunch", 'medium', 'todo', [], '2026-10-21T23:59')),
+    ("gym at 7pm", ("gym", 'medium', 'todo', [], '2026-10-14T19:00')),
+    ("call mom in an hour", ("call mom", 'medium', 'todo', [], '2026-10-14T11:00')),
+    ("water plants in 2 hours #home", ("water plants", 'medium', 'todo', ['home'], '2026-10-14T12:00')),
+    ("Book flights in 1 week maybe", ("Book flights", 'low', 'todo', [], '2026-10-21T10:00')),
+    ("Pick up parcel tmrw @ 9:15", ("Pick up parcel", 'medium', 'todo', [], '2026-10-15T09:15')),
+    ("bus @7:05am", ("bus", 'medium', 'todo', [], '2026-10-15T07:05')),
+    ("low priority clean garage whenever", ("clean garage", 'low', 'todo', [], None)),
+    ("fix bug already started #work #bugs", ("fix bug", 'medium', 'inprogress', ['work', 'bugs'], None)),
+    ("taxes already done", ("taxes", 'medium', 'done', [], None)),
+    ("#a #b #a tag dupes", ("tag dupes", 'medium', 'todo', ['a', 'b'], None)),
+    # A bare "done" is part of the title, a lone keyword is kept as the title
+    ("done with the dishes", ("done with the dishes", 'medium', 'todo', [], None)),
+    ("asap", ("asap", 'high', 'todo', [], None)),
+    # Not dates or times: left in the title, no deadline
+    ("file 2026-02-30 report", ("file 2026-02-30 report", 'medium', 'todo', [], None)),
+    ("meeting at 25:00", ("meeting at 25:00", 'medium', 'todo', [], None)),
+    ("lunch at 13pm", ("lunch at 13pm", 'medium', 'todo', [], None)),
+    ("renew passport in 99999999 days", ("renew passport in 99999999 days", 'medium', 'todo', [], None)),
+    ("in 10000000 weeks retire", ("in 10000000 weeks retire", 'medium', 'todo', [], None)),
+    ("in " + "9" * 400 + " minutes", ("in " + "9" * 97, 'medium', 'todo', [], None)),
+]
+
+
+@pytest.mark.parametrize('text, expected', CORPUS, ids=[text[:40] for text, _ in CORPUS])
+def test_corpus(text, expected):
+    parsed = parse_task(text, now=NOW)
+    due = parsed.due_date.isoformat(timespec='minutes') if parsed.due_date else None
+    assert (parsed.title, parsed.priority, parsed.status, parsed.tags, due) == expected
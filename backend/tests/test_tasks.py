@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def task(client, make_user):
+    _, headers = make_user()
+    response = client.post('/api/tasks', json={'title': 'Task'}, headers=headers)
+    assert response.status_code == 201
+    return headers, response.get_json()
+
+
+@pytest.mark.parametrize('value', ['false', 'true', 0, 1, None])
+def test_update_rejects_non_boolean_completed(client, task, value):
+    headers, created = task
+    response = client.put(f"/api/tasks/{created['id']}", json={'completed': value}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'completed must be true or false'}
+    assert client.get('/api/tasks', headers=headers).get_json()[0]['completed'] is False
+
+
+def test_update_sets_completed(client, task):
+    headers, created = task
+    response = client.put(f"/api/tasks/{created['id']}", json={'completed': True}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['completed'] is True
+    assert client.get('/api/tasks/summary', headers=headers).get_json()['completed'] == 1
+
+
+@pytest.fixture
+def archived_task(app, client, task):
+    from app import ArchivedTask
+    headers, created = task
+    assert client.put(f"/api/tasks/{created['id']}", json={'completed': True}, headers=headers).status_code == 200
+    with app.app_context():
+        assert ArchivedTask.archive(datetime.utcnow() + timedelta(days=1), 1000) >= 1
+        db.session.commit()
+    return headers, created['id']
+
+
+def test_update_of_archived_task_is_rejected(client, archived_task):
+    headers, task_id = archived_task
+    response = client.put(f'/api/tasks/{task_id}', json={'title': 'Changed'}, headers=headers)
+    assert response.status_code == 409
+    assert response.get_json() == {'error': 'Archived tasks are read-only'}
+    response = client.patch('/api/tasks/batch', json={'tasks': [{'id': task_id, 'title': 'Changed'}]},
+                            headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == 'Archived tasks are read-only'
+    assert client.get(f'/api/tasks/{task_id}', headers=headers).get_json()['title'] == 'Task'
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_archived_task_can_be_deleted(client, archived_task, batch):
+    headers, task_id = archived_task
+    since = client.get('/api/tasks/changes', headers=headers).get_json()['next_since']
+    if batch:
+        response = client.delete('/api/tasks/batch', json={'ids': [task_id]}, headers=headers)
+    else:
+        response = client.delete(f'/api/tasks/{task_id}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert client.get(f'/api/tasks/{task_id}', headers=headers).status_code == 404
+    changes = client.get('/api/tasks/changes', query_string={'since': since}, headers=headers).get_json()
+    assert changes['deletes'] == [task_id]
+
+
+def test_archived_task_of_another_user_is_not_deleted(client, make_user, archived_task):
+    _, task_id = archived_task
+    _, other = make_user()
+    assert client.delete(f'/api/tasks/{task_id}', headers=other).status_code == 403
+    response = client.delete('/api/tasks/batch', json={'ids': [task_id]}, headers=other)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('method', ['put', 'delete'])
+def test_missing_task_is_404(client, make_user, method):
+    _, headers = make_user()
+    response = getattr(client, method)('/api/tasks/999999999', json={'title': 'x'}, headers=headers)
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Task not found'}
+
+
+@pytest.mark.parametrize('due_date, stored', [
+    ('2026-10-14T10:00:00+02:00', '2026-10-14T08:00:00'),
+    ('2026-10-14T10:00:00-05:30', '2026-10-14T15:30:00'),
+    ('2026-10-14T10:00:00Z', '2026-10-14T10:00:00'),
+    ('2026-10-14T10:00:00', '2026-10-14T10:00:00'),
+])
+def test_due_date_offsets_are_converted_to_utc(client, task, due_date, stored):
+    headers, created = task
+    response = client.put(f"/api/tasks/{created['id']}", json={'due_date': due_date}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['due_date'] == stored
+    assert client.get(f"/api/tasks/{created['id']}", headers=headers).get_json()['due_date'] == stored
+    response = client.post('/api/tasks', json={'title': 'Offset', 'due_date': due_date}, headers=headers)
+    assert response.get_json()['due_date'] == stored
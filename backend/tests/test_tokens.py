@@ -0,0 +1,89 @@
+import re
+import time
+
+import pytest
+
+from app import TokenRevocation, User, db, token_revocations
+
+USER_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+"?(?:user|token_revocation)\b')
+
+
+def status(client, headers):
+    return client.get('/api/tasks?limit=5', headers=headers).status_code
+
+
+def test_deactivation_rejects_the_next_request(app, client, make_user):
+    user_id, headers = make_user()
+    assert status(client, headers) == 200
+    with app.app_context():
+        db.session.get(User, user_id).is_active = False
+        db.session.commit()
+    assert status(client, headers) == 401
+
+
+def test_logout_all_rejects_older_tokens(client, make_user):
+    _, headers = make_user()
+    response = client.post('/api/auth/logout-all', headers=headers)
+    assert response.status_code == 200
+    assert status(client, headers) == 401
+    assert status(client, {'Authorization': 'Bearer ' + response.get_json()['token']}) == 200
+
+
+def test_deleted_account_token_is_rejected(client, make_user):
+    _, headers = make_user()
+    assert client.delete('/api/auth/delete-account', headers=headers).status_code == 200
+    assert status(client, headers) == 401
+
+
+def test_revocation_from_another_process_applies_within_the_interval(app, client, make_user, monkeypatch):
+    interval = 0.3
+    monkeypatch.setattr(token_revocations, 'interval', interval)
+    user_id, headers = make_user()
+    assert status(client, headers) == 200
+    # Written straight to the table, as another worker would: this process
+    # gets no mark_stale() and has to notice on its periodic refresh
+    with app.app_context():
+        with db.engine.begin() as connection:
+            TokenRevocation.revoke(connection, user_id)
+    revoked_at = time.monotonic()
+    while status(client, headers) == 200:
+        assert time.monotonic() - revoked_at < interval + 0.5
+        time.sleep(0.01)
+    assert time.monotonic() - revoked_at <= interval + 0.1
+
+
+@pytest.fixture
+def no_refresh(app, monkeypatch):
+    """Load the revocation list now and not again during the test."""
+    monkeypatch.setattr(token_revocations, 'interval', 3600)
+    token_revocations.mark_stale()
+    with app.app_context():
+        token_revocations.refresh()
+
+
+def test_hot_path_runs_no_user_or_revocation_queries(client, make_user, capture_sql, no_refresh):
+    _, headers = make_user()
+    assert status(client, headers) == 200
+    with capture_sql() as statements:
+        for _ in range(20):
+            assert status(client, headers) == 200
+            assert client.get('/api/tasks/summary', headers=headers).status_code == 200
+    # The task list's ETag reads tasks_version; nothing else may touch the user row
+    lookups = [sql for sql, _ in statements if USER_TABLES.search(sql) and 'user.tasks_version' not in sql]
+    assert lookups == []
+
+
+def test_revocation_check_is_cheap(no_refresh):
+    claims = {'sub': '1', 'gen': 0, 'active': True}
+    calls = 100_000
+    started = time.perf_counter()
+    for user_id in range(calls):
+        token_revocations.is_revoked(user_id, claims)
+    per_call = (time.perf_counter() - started) / calls
+    assert per_call < 5e-6, f'{per_call * 1e6:.2f} us per check'
+
+
+@pytest.fixture(autouse=True)
+def fresh_revocations():
+    yield
+    token_revocations.mark_stale()
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from benchmark import command_update
+from webhook import UpdateDispatcher
+
+UPDATE = {'update_id': 1, 'message': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'},
+                                      'from': {'id': 1, 'is_bot': False, 'first_name': 'Eve'}, 'text': '/tasks'}}
+
+
+@pytest.mark.parametrize('configured, sent', [
+    (None, None),
+    (None, ''),
+    ('s3cret', None),
+    ('s3cret', 'guess'),
+])
+def test_webhook_rejects_unauthenticated_updates(app, client, monkeypatch, configured, sent):
+    monkeypatch.setitem(app.config, 'TELEGRAM_WEBHOOK_SECRET', configured)
+    headers = {} if sent is None else {'X-Telegram-Bot-Api-Secret-Token': sent}
+    response = client.post('/telegram/webhook', json=UPDATE, headers=headers)
+    assert response.status_code == 403
+
+
+def test_webhook_accepts_the_configured_secret(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'TELEGRAM_WEBHOOK_SECRET', 's3cret')
+    response = client.post('/telegram/webhook', json=UPDATE, headers={'X-Telegram-Bot-Api-Secret-Token': 's3cret'})
+    # Past the secret check; no bot is running in the test process
+    assert response.status_code == 503
+    assert response.get_json() == {'error': 'Bot is not running in webhook mode'}
+
+
+@pytest.fixture
+def dispatcher(app, monkeypatch):
+    """Start a fresh UpdateDispatcher behind the route, its loop on a thread
+    of its own as the bot's is; call with ``process`` and start options."""
+    monkeypatch.setitem(app.config, 'TELEGRAM_WEBHOOK_SECRET', 's3cret')
+    updates = UpdateDispatcher()
+    monkeypatch.setattr(app_module, 'telegram_updates', updates)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def start(process, **options):
+        asyncio.run_coroutine_threadsafe(updates.start(process, **options), loop).result(5)
+        return updates
+    start.drain = lambda: asyncio.run_coroutine_threadsafe(updates.stop(), loop).result(5)
+    yield start
+    start.drain()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def post(client, update):
+    return client.post('/telegram/webhook', json=update, headers={'X-Telegram-Bot-Api-Secret-Token': 's3cret'})
+
+
+def test_redelivered_update_is_acknowledged_once(client, dispatcher):
+    handled = []
+
+    async def process(update):
+        handled.append(update['update_id'])
+
+    dispatcher(process)
+    update = command_update(1, 42, '/tasks')
+    assert post(client, update).get_json() == {'status': 'accepted'}
+    # Telegram retrying a delivery it thinks failed
+    response = post(client, update)
+    assert (response.status_code, response.get_json()) == (200, {'status': 'duplicate'})
+    dispatcher.drain()
+    assert handled == [1]
+
+
+def test_each_chats_updates_run_one_at_a_time_in_order(client, dispatcher):
+    handled, running, clashes, widths = [], set(), [], []
+
+    async def process(update):
+        chat = update['message']['chat']['id']
+        if chat in running:
+            clashes.append(update['update_id'])
+        running.add(chat)
+        widths.append(len(running))
+        # Earlier updates take longer, so a reordering would show
+        await asyncio.sleep(0.03 if update['update_id'] % 5 == 1 else 0.001)
+        running.discard(chat)
+        handled.append((chat, update['update_id']))
+
+    dispatcher(process, workers=4)
+    chats = [101, 102, 103]
+    updates = [command_update(i, chats[i % 3], f'message {i}') for i in range(1, 31)]
+    for update in updates:
+        assert post(client, update).status_code == 200
+    dispatcher.drain()
+    for chat in chats:
+        assert [i for c, i in handled if c == chat] == [update['update_id'] for update in updates
+                                                        if update['message']['chat']['id'] == chat]
+    # No update ran while another of its chat did, but chats ran side by side
+    assert clashes == []
+    assert max(widths) > 1
+
+
+def test_full_queue_answers_503_until_it_drains(client, dispatcher):
+    release = threading.Event()
+
+    async def process(update):
+        while not release.is_set():
+            await asyncio.sleep(0.005)
+
+    updates = dispatcher(process, workers=1, max_pending=2)
+    assert [post(client, command_update(i, 7, 'hi')).status_code for i in (1, 2)] == [200, 200]
+    response = post(client, command_update(3, 7, 'hi'))
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json() == {'error': 'Update queue is full'}
+    release.set()
+    while updates.stats()['pending']:
+        time.sleep(0.005)
+    # The retry gets in, and was not remembered as seen while rejected
+    assert post(client, command_update(3, 7, 'hi')).get_json() == {'status': 'accepted'}
+    dispatcher.drain()
+    assert updates.stats()['rejected'] == 1
+    assert updates.stats()['processed'] == 3
@@ -0,0 +1,63 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class TokenRevocations:
+    """In-memory copy of the token_revocation table checked on every request.
+
+    Access tokens carry the user's token generation ("gen") and an "active"
+    flag. A token is revoked when its user has a revocation entry that is
+    inactive (deactivated or deleted account) or whose generation is newer than
+    the token's. Only users that were ever revoked have an entry, so the common
+    case is one dict lookup and no database query.
+
+    ``load(since)`` returns ``(user_id, generation, active, updated_at)`` rows
+    changed after ``since`` (all rows when ``since`` is None). The table is
+    re-read incrementally every ``interval`` seconds, which bounds how long
+    another process (e.g. a second gunicorn worker) keeps accepting a revoked
+    token; revocations committed in this process call ``mark_stale`` and take
+    effect on the next request. ``overlap`` re-reads recent rows so a
+    revocation committed just after its timestamp was written is not missed.
+    """
+
+    def __init__(self, load, interval=5.0, overlap=60.0):
+        self.load = load
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._since = None
+        self._next_refresh = 0.0
+        self.refreshes = 0
+
+    def mark_stale(self):
+        self._next_refresh = 0.0
+
+    def refresh(self):
+        with self._lock:
+            if time.monotonic() < self._next_refresh:
+                return
+            started = datetime.utcnow()
+            for user_id, generation, active, _ in self.load(self._since):
+                self._entries[user_id] = (generation, active)
+            self._since = started - self.overlap
+            self._next_refresh = time.monotonic() + self.interval
+            self.refreshes += 1
+
+    def is_revoked(self, user_id, claims):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        if claims.get('active') is False:
+            return True
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False
+        generation, active = entry
+        return not active or claims.get('gen', 0) < generation
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._since = None
+            self._next_refresh = 0.0
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from collections import OrderedDict, deque
+
+
+def chat_key(update):
+    """The chat an update belongs to; updates of one chat are handled in order."""
+    for field in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        if field in update:
+            return update[field].get('chat', {}).get('id')
+    query = update.get('callback_query')
+    if query:
+        return (query.get('message') or {}).get('chat', {}).get('id') or query.get('from', {}).get('id')
+    return None
+
+
+class UpdateDispatcher:
+    """Hands webhook updates from Flask threads to worker coroutines on the bot's loop.
+
+    ``offer`` is called from the request thread and answers immediately:
+    "accepted", "duplicate" (update_id seen recently, e.g. a Telegram retry),
+    "busy" (``max_pending`` updates already waiting, so the webhook replies
+    503 and Telegram retries later) or "stopped". ``workers`` coroutines
+    process updates concurrently, but a chat's updates run one at a time and
+    in arrival order: whichever worker holds the chat drains its backlog.
+    """
+
+    def __init__(self):
+        self.process = None
+        self.max_pending = 0
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._active = {}  # chat -> deque of updates waiting behind the one being processed
+        self._seen = OrderedDict()
+        self._dedup_size = 0
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def running(self):
+        return self._loop is not None
+
+    async def start(self, process, workers=4, max_pending=1000, dedup_size=10000):
+        self.process = process
+        self.max_pending = max_pending
+        self._dedup_size = dedup_size
+        self._queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(workers)]
+
+    async def stop(self, drain=True):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if drain:
+            # Let puts scheduled by offers accepted before the lock land first
+            await asyncio.sleep(0)
+            await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def offer(self, update):
+        update_id = update.get('update_id')
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                return 'stopped'
+            if update_id is not None and update_id in self._seen:
+                self.duplicates += 1
+                return 'duplicate'
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return 'busy'
+            if update_id is not None:
+                self._seen[update_id] = None
+                if len(self._seen) > self._dedup_size:
+                    self._seen.popitem(last=False)
+            self.pending += 1
+            self.accepted += 1
+            loop.call_soon_threadsafe(self._queue.put_nowait, update)
+        return 'accepted'
+
+    async def _work(self):
+        while True:
+            update = await self._queue.get()
+            key = chat_key(update)
+            if key is not None and key in self._active:
+                # Another worker is on this chat; it picks this up next
+                self._active[key].append(update)
+                self._queue.task_done()
+                continue
+            backlog = self._active[key] = deque() if key is not None else None
+            try:
+                while True:
+                    await self._run(update)
+                    if not backlog:
+                        break
+                    update = backlog.popleft()
+            finally:
+                if key is not None:
+                    del self._active[key]
+                self._queue.task_done()
+
+    async def _run(self, update):
+        try:
+            await self.process(update)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Update {update.get('update_id')} failed: {e}")
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self.pending,
+                'accepted': self.accepted,
+                'duplicates': self.duplicates,
+                'rejected': self.rejected,
+                'processed': self.processed,
+                'failed': self.failed,
+            }
+
+
+telegram_updates = UpdateDispatcher()
@@ -1,5 +1,5 @@
 import type { Route } from "../+types/home";
-import React, { useState, useMemo, type SyntheticEvent } from "react";
+import React, { useState, useMemo, useEffect, type SyntheticEvent } from "react";
 import { motion, AnimatePresence } from "framer-motion";
 import { CreateTaskForm } from "./taskCreateComponent";
 import {
@@ -28,6 +28,9 @@ interface Task {
     due_date: string;
 }
 
+// Tasks per request; older ones are fetched with the API's next_cursor
+const TASKS_PAGE_SIZE = 100;
+
 const STATUS_COLUMNS = [
     { key: "todo", title: "To Do" },
     { key: "inprogress", title: "In Progress" },
@@ -89,8 +92,13 @@ export const loader = async ({
         // Redirect to the home page if they are already signed in.
         return redirect("/auth/login")
     }
+    const page = new URLSearchParams({ limit: String(TASKS_PAGE_SIZE) });
+    const cursor = new URL(request.url).searchParams.get("cursor");
+    if (cursor) {
+        page.set("cursor", cursor);
+    }
     try {
-        const res = await fetch(`${process.env.API_URL ?? ""}/api/tasks`, {
+        const res = await fetch(`${process.env.API_URL ?? ""}/api/tasks?${page}`, {
             method: "GET",
             headers: {
                 "Content-Type": "application/json",
@@ -106,13 +114,12 @@ export const loader = async ({
             return { ok: false, message: err.message || "Invalid credentials" };
         }
 
-        const data = await res.json() as Task[];
-        console.log(data)
-        data.map((task: Task) => {
+        const data = await res.json() as { tasks: Task[], next_cursor: string | null };
+        data.tasks.map((task: Task) => {
             task.tags = JSON.parse(task.tags as unknown as string);
             return task;
         })
-        return { tasks: data };
+        return { tasks: data.tasks, nextCursor: data.next_cursor };
     } catch (err: any) {
         return { ok: false, message: err.message };
     }
@@ -218,16 +225,43 @@ function PriorityPill({ priority }: { priority: Priority }) {
 
 // ---------------- MAIN COMPONENT ----------------
 export default function TasksList({ loaderData }: Route.ComponentProps) {
-    const { tasks } = useLoaderData<typeof loader>();
+    const { tasks: firstPage, nextCursor } = useLoaderData<typeof loader>();
     const fetcher = useFetcher()
+    const olderFetcher = useFetcher<typeof loader>();
+    const [olderTasks, setOlderTasks] = useState<Task[]>([]);
+    const [cursor, setCursor] = useState<string | null | undefined>(nextCursor);
     const [selectedTask, setSelectedTask] = useState<Task | null>(null);
     const [query, setQuery] = useState("");
     const [isModalOpen, setModalOpen] = useState(false);
     const [tagFilter, setTagFilter] = useState<string[]>([]);
     const [assigneeFilter, setAssigneeFilter] = useState<string[]>([]);
     const [draggingId, setDraggingId] = useState<string | null>(null);
-    console.log("here are tasks")
-    console.log(tasks)
+
+    useEffect(() => {
+        // Only until older pages are loaded: after that their own cursor is further along
+        if (!olderTasks.length) setCursor(nextCursor);
+    }, [nextCursor]);
+
+    useEffect(() => {
+        const page = olderFetcher.data;
+        if (page && "tasks" in page && page.tasks) {
+            setOlderTasks((prev) => [...prev, ...page.tasks]);
+            setCursor(page.nextCursor);
+        }
+    }, [olderFetcher.data]);
+
+    const tasks = useMemo(() => {
+        // The first page is reloaded after every change; older pages are kept
+        const fresh = new Set((firstPage || []).map((t: Task) => t.id));
+        return [...(firstPage || []), ...olderTasks.filter((t) => !fresh.has(t.id))];
+    }, [firstPage, olderTasks]);
+
+    function loadOlderTasks() {
+        if (cursor) {
+            olderFetcher.load(`/tasks?index&cursor=${encodeURIComponent(cursor)}`);
+        }
+    }
+
     const filtered = useFilteredTasks(tasks ? tasks : [], query, tagFilter, assigneeFilter);
 
     function onDragStart(e: MouseEvent | TouchEvent | PointerEvent, id: string) {
@@ -291,6 +325,15 @@ export default function TasksList({ loaderData }: Route.ComponentProps) {
                     >
                         <PlusCircle size={16} /> Create
                     </button>
+                    {cursor && (
+                        <button
+                            onClick={loadOlderTasks}
+                            disabled={olderFetcher.state !== "idle"}
+                            className="px-4 py-2 rounded-xl border bg-white shadow-sm hover:bg-gray-50 disabled:opacity-50"
+                        >
+                            {olderFetcher.state !== "idle" ? "Loading..." : "Load older"}
+                        </button>
+                    )}
                 </div>
             </div>
             <div className="mb-3 h-16">